@@ -14,13 +14,29 @@ from kivy.uix.button import Button
 from kivy.uix.image import Image
 from kivy.uix.spinner import Spinner
 from kivy.uix.slider import Slider
+from kivy.uix.popup import Popup
+from kivy.uix.filechooser import FileChooserListView
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.properties import ListProperty, StringProperty, NumericProperty, BooleanProperty
-from kivy.core.window import Window
 from kivy.metrics import dp
 from kivy.clock import Clock 
 from kivy.utils import platform
-from kivy.uix.scrollview import ScrollView # Nueva importación para la lista de ganadores
+from kivy.uix.recycleview import RecycleView # Lista de ganadores virtualizada
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.graphics import Color, RoundedRectangle
+import bisect
+import multiprocessing
+import threading
+import time
+
+from sorteo_logic import (
+    ParticipantStore, RaffleRng, Winner, make_pool, load_participant_store, expand_sources, read_keys,
+    eligibility_mask, generate_dummy_data,
+)
+from sorteo_journal import RaffleJournal, read_events, replay, winner_record
+from sorteo_history import WinnersHistory, HISTORY_PATH
+import sorteo_metrics as metrics
+from sorteo_tiers import PrizeTier, TierDraw, GroupIndex, quota_pick, quota_draw
 
 # --- Configuración de Colores y Estilos de Mettatec ---
 COLOR_METTATEC_PRIMARY = (0.05, 0.17, 0.31, 1)  # Azul Oscuro (#0E2C4F)
@@ -29,36 +45,72 @@ COLOR_BACKGROUND_LIGHT = (0.97, 0.97, 0.97, 1) # Fondo muy claro (#F7F7F7)
 COLOR_TEXT_LIGHT = (1, 1, 1, 1)
 COLOR_TEXT_DARK = (0, 0, 0, 1)
 
-# Forzar formato vertical para simular dispositivo móvil
-Window.size = (400, 700)
-Window.minimum_width = 400
-Window.minimum_height = 700
-
 # 1° CORRECCIÓN: Nombre de archivo de entrada por defecto
 INPUT_FILENAME = "PARTICIPANTES.xlsx"
+# (También se puede cargar una carpeta, p. ej. una planilla por sede: se unen todas sus planillas)
 # Nombre de archivo de salida por defecto
 OUTPUT_FILENAME = "GANADORES.xlsx"
-# Capacidad máxima de participantes para simulación/lógica
-MAX_PARTICIPANTS = 500
-
-# --- DATA DUMMY (Solo para demostrar la estructura inicial si no hay archivo) ---
-def generate_dummy_data():
-    headers = ['ID', 'Nombre_Completo', 'Email', 'Ciudad', 'Area']
-    participants = []
-    for i in range(1, MAX_PARTICIPANTS + 1): 
-        participants.append({
-            'ID': str(i),
-            'Nombre_Completo': f"Participante {i:03d}",
-            'Email': f"user{i:03d}@mettatec.com",
-            'Ciudad': random.choice(['Lima', 'Bogotá', 'Santiago', 'Quito', 'Buenos Aires']),
-            'Area': random.choice(['Desarrollo', 'Ventas', 'Soporte', 'Marketing', 'Finanzas'])
-        })
-    return headers, participants
+# Diario del sorteo (JSON-lines, solo-agregar) para reanudar tras un cierre inesperado
+JOURNAL_FILENAME = "SORTEO_JOURNAL.jsonl"
+# Cantidad de participantes de la simulación (sin archivo de entrada)
+DUMMY_PARTICIPANTS = 500
+# Opción del selector de peso para un sorteo sin pesos
+NO_WEIGHT_LABEL = "(NINGUNO)"
+# Cantidad de nombres (muestra aleatoria) que cicla la animación de giro
+SPIN_BUFFER_SIZE = 256
+# Intervalo entre cuadros de la animación de giro (s); con SORTEO_METRICS se cuentan los cuadros perdidos
+SPIN_INTERVAL = 0.05
+# Columna que identifica a cada persona en las listas y el historial ('' = la primera columna)
+KEY_FIELD = ''
+# Depuración al cargar: True = una participación por persona (se quitan las filas con KEY_FIELD repetido)
+DEDUP_BY_KEY = False
+# Listas opcionales (en la carpeta del archivo de participantes) de personas no habilitadas
+EXCLUSION_FILENAME = "EXCLUIDOS.xlsx"
+PREVIOUS_WINNERS_FILENAME = "GANADORES_ANTERIORES.xlsx"
+# Excluir a quienes ganaron en los últimos N sorteos del historial (0 = no excluir)
+HISTORY_LAST_EVENTS = 0
+# Categorías de premios, "NOMBRE:CANTIDAD[:COLUMNA=VALOR1|VALOR2]" (Premio #1 en la primera);
+# p. ej. ["Mayor:1", "Medio:50:Ciudad=Lima", "Menor:2000:Area=Ventas|Soporte"]. [] = sin categorías
+PRIZE_TIERS = []
+# Cuota por grupo: al menos QUOTA_MIN ganadores por cada valor de la columna QUOTA_FIELD
+# (p. ej. 'Ciudad'); '' = sin cuota. No se combina con PRIZE_TIERS
+QUOTA_FIELD = ''
+QUOTA_MIN = 1
+
+def unfinished_raffle(digest, n):
+    """Estado del diario si corresponde a un sorteo sin terminar de esos datos; si no, None."""
+    if digest is None:
+        return None
+    state = replay(read_events(JOURNAL_FILENAME))
+    start = state["start"]
+    if (start is None or state["rng"] is None or start.get("digest") != digest
+            or start.get("n") != n
+            or len(state["winners"]) >= (state["num_winners"] or 0) or state["finished"]):
+        return None
+    return state
+
+def check_eligibility(store, directory, history=None, own_event=None):
+    """
+    Listas de exclusión / ganadores anteriores que estén en `directory`, más el
+    historial de los últimos HISTORY_LAST_EVENTS sorteos (sin contar `own_event`)
+    y, con DEDUP_BY_KEY, duplicados por KEY_FIELD. Devuelve (máscara de habilitados, reporte).
+    """
+    key = KEY_FIELD or store.headers[0]
+    keys = store.series(key)
+    lists = []
+    for filename in (EXCLUSION_FILENAME, PREVIOUS_WINNERS_FILENAME):
+        path = os.path.join(directory, filename)
+        lists.append([read_keys(path, key)] if os.path.exists(path) else [])
+    if history is not None and HISTORY_LAST_EVENTS:
+        lists[1].append(history.won(keys, HISTORY_LAST_EVENTS, exclude_event=own_event))
+    return eligibility_mask(keys, *lists, dedup=DEDUP_BY_KEY)
 
 # --- Lógica de la Aplicación Principal ---
 class RaffleApp(App):
     # Propiedades para gestionar el estado del sorteo
-    participants = ListProperty([])
+    # Participantes en un ParticipantStore columnar (atributo normal, no ListProperty,
+    # para no despachar eventos ni guardar un dict por fila)
+    participants = None
     headers = ListProperty([])
     winners = ListProperty([])
     num_winners = NumericProperty(1)
@@ -67,9 +119,33 @@ class RaffleApp(App):
     max_winners = NumericProperty(5)
     field_1 = StringProperty('')
     field_2 = StringProperty('')
+    # Columna de peso opcional (boletos, puntos...); '' = todos con la misma probabilidad
+    weight_field = StringProperty('')
+    # True mientras se leen los participantes en segundo plano (deshabilita iniciar/cargar)
+    is_loading = BooleanProperty(False)
     is_drawing = BooleanProperty(False)
     # Nuevo estado: True si un ganador fue revelado y espera confirmación/redraw
     winner_revealed = BooleanProperty(False)
+    # Posiciones de participantes aún sorteables (se crea en start_raffle)
+    pool = None
+    # Flujo aleatorio persistente del sorteo; rng_seed=None usa entropía del sistema
+    rng = None
+    rng_seed = None
+    # Textos ya formateados para la animación de giro (muestra de SPIN_BUFFER_SIZE nombres)
+    spin_labels = []
+    # Máscara de participantes habilitados (sin duplicados ni excluidos); None = todos
+    eligible = None
+    # Categorías del sorteo en curso (PrizeTier); con categorías, pool es un TierDraw
+    tiers = []
+    # Cuota del sorteo en curso ({"field", "min"} o None) y grupos de su columna (GroupIndex, al cargar)
+    quota = None
+    groups = None
+    # Historial de ganadores entre sorteos y evento del sorteo actual (None en simulación)
+    history = None
+    history_event = None
+    # Hash del archivo cargado (None en simulación) y diario del sorteo
+    data_digest = None
+    journal = None
 
     def build(self):
         """Inicializa la aplicación y el gestor de pantallas."""
@@ -85,78 +161,142 @@ class RaffleApp(App):
         self.sm.add_widget(self.raffle_screen)
         self.sm.add_widget(self.winners_list_screen) # AÑADIR NUEVA PANTALLA
 
-        # Intenta cargar datos del archivo real al inicio
+        # Intenta cargar datos del archivo real al inicio (en segundo plano: la ventana se muestra enseguida)
         self.load_data()
 
         return self.sm
 
     def load_data(self, file_path=INPUT_FILENAME):
         """
-        Carga datos del archivo Excel (o CSV) especificado.
+        Carga datos del archivo Excel (o CSV/Parquet/Feather) especificado en un hilo
+        aparte: la ventana sigue respondiendo y el avance se informa en SetupScreen.
+        `file_path` también puede ser una carpeta, un patrón o una lista de archivos:
+        se unen (mismas columnas) parseándolos en procesos paralelos.
         """
-        try:
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"Archivo {file_path} no encontrado.")
-            
-            df = pd.read_excel(file_path)
-            
-            if len(df) > MAX_PARTICIPANTS:
-                df = df.head(MAX_PARTICIPANTS)
-                self.setup_screen.show_message(
-                    f"ADVERTENCIA: ARCHIVO TRUNCADO A {MAX_PARTICIPANTS} PARTICIPANTES.",
-                    (1, 0.6, 0.0, 1) 
-                )
-
-            h = list(df.columns)
-            p = df.to_dict('records')
+        if self.is_loading:
+            return
+        self.is_loading = True
+        self.setup_screen.show_message("CARGANDO PARTICIPANTES...", COLOR_METTATEC_ACCENT)
+        threading.Thread(target=self._load_worker, args=(file_path,), daemon=True).start()
 
-            self.headers = h
-            self.participants = p
+    def _report_progress(self, text):
+        """Muestra el avance de la carga (desde el hilo de carga, vía el reloj de Kivy)."""
+        Clock.schedule_once(lambda dt: self.setup_screen.show_message(text, COLOR_METTATEC_ACCENT))
 
-            self.field_1 = h[1] if len(h) > 1 else h[0]
-            self.field_2 = h[2] if len(h) > 2 else h[0]
+    def _load_worker(self, file_path):
+        """Lee y prepara los participantes fuera del hilo de la interfaz (no toca widgets)."""
+        try:
+            # Las listas de exclusión de la carpeta no son planillas de participantes
+            sources = expand_sources(file_path, skip=(EXCLUSION_FILENAME, PREVIOUS_WINNERS_FILENAME))
+            if not sources:
+                raise FileNotFoundError(f"Archivo {file_path} no encontrado.")
 
-            num_participants = len(self.participants)
-            
-            # ACTUALIZAR ETIQUETA DE CONTEO DE PARTICIPANTES
+            # Usa la instantánea binaria junto al archivo (o a la carpeta) si está al día (sin volver a parsear)
+            with metrics.timed("load", app="kivy"):
+                p, digest = load_participant_store(sources[0] if len(sources) == 1 else sources,
+                                                   progress=self._report_progress)
+        except Exception as e:
+            # Sin archivo (o con errores de formato): se usan los datos de simulación
+            result = (ParticipantStore(generate_dummy_data(DUMMY_PARTICIPANTS)), None, None, None, e, None)
+        else:
+            self._report_progress("DEPURANDO PARTICIPANTES...")
+            try:
+                # Un sorteo sin terminar de estos datos no se excluye a sí mismo al reanudarlo
+                saved = unfinished_raffle(digest, len(p))
+                own_event = saved["start"].get("history_event") if saved else None
+                with metrics.timed("eligibility", app="kivy"):
+                    eligible, report = check_eligibility(p, os.path.dirname(sources[0]), self.get_history(), own_event)
+            except Exception as e:
+                print(f"Error al aplicar las listas de exclusión: {e}")
+                eligible, report = None, None
+            # Grupos de la columna de la cuota: una sola vez, fuera del hilo de la interfaz
+            groups = GroupIndex(p, QUOTA_FIELD) if QUOTA_FIELD in p.headers else None
+            result = (p, digest, eligible, report, None, groups)
+        Clock.schedule_once(lambda dt: self._on_data_loaded(*result))
+
+    def _on_data_loaded(self, participants, digest, eligible, report, error, groups):
+        """Aplica el resultado de la carga en el hilo de la interfaz."""
+        self.data_digest = digest
+        self.groups = groups
+        self.participants = participants
+        self.eligible = eligible
+        self.headers = participants.headers
+
+        num_participants = len(self.participants)
+        if error is None and report is None:
+            # Los datos se cargaron pero no se pudieron aplicar las listas de exclusión
             self.setup_screen.participant_count_label.text = f"NÚMERO DE PARTICIPANTES: {num_participants}"
-
-            self.setup_screen.show_message(
-                f"DATOS CARGADOS CON ÉXITO.",
-                COLOR_METTATEC_ACCENT
+            self.setup_screen.show_message("LISTAS DE EXCLUSIÓN NO APLICADAS.", (1, 0.6, 0.0, 1))
+        elif error is None:
+            # ACTUALIZAR ETIQUETA DE CONTEO DE PARTICIPANTES (habilitados de los cargados)
+            self.setup_screen.participant_count_label.text = (
+                f"NÚMERO DE PARTICIPANTES: {report['eligible']}"
+                + (f" DE {num_participants}" if report['eligible'] < num_participants else "")
             )
-
-        except FileNotFoundError:
-            # Si el archivo no existe, cargamos los datos dummy y notificamos
-            h, p = generate_dummy_data()
-            self.headers = h
-            self.participants = p
-            self.field_1 = h[1]
-            self.field_2 = h[2]
-
-            # Actualizar etiqueta de conteo
-            self.setup_screen.participant_count_label.text = f"NÚMERO DE PARTICIPANTES: {len(self.participants)} (SIMULACIÓN)"
-            
-            # CORRECCIÓN SOLICITADA EN REQUISITO PREVIO: Mensaje de error simplificado
             self.setup_screen.show_message(
-                f"DATOS NO CARGADOS", 
-                (1, 0.4, 0.4, 1)
+                f"DATOS CARGADOS: {report['duplicates']} DUPLICADOS, {report['excluded']} EXCLUIDOS, "
+                f"{report['previous_winners']} YA GANARON.",
+                COLOR_METTATEC_ACCENT
             )
-        except Exception as e:
-            # Manejo de otros errores (formato de Excel, etc.)
-            h, p = generate_dummy_data()
-            self.headers = h
-            self.participants = p
-            
+        else:
             # Actualizar etiqueta de conteo
-            self.setup_screen.participant_count_label.text = f"NÚMERO DE PARTICIPANTES: {len(self.participants)} (SIMULACIÓN)"
+            self.setup_screen.participant_count_label.text = f"NÚMERO DE PARTICIPANTES: {num_participants} (SIMULACIÓN)"
 
             # CORRECCIÓN SOLICITADA EN REQUISITO PREVIO: Mensaje de error simplificado
             self.setup_screen.show_message(
-                f"DATOS NO CARGADOS", 
-                (1, 0, 0, 1)
+                f"DATOS NO CARGADOS",
+                (1, 0.4, 0.4, 1) if isinstance(error, FileNotFoundError) else (1, 0, 0, 1)
             )
 
+        self.build_spin_labels()
+        self.setup_screen.resume_button.disabled = self.saved_raffle() is None
+        self.is_loading = False
+
+    def log_event(self, event, **data):
+        """Agrega un evento al diario del sorteo (se abre al primer uso)."""
+        if self.journal is None:
+            self.journal = RaffleJournal(JOURNAL_FILENAME)
+        self.journal.append(event, rng=self.rng.to_dict(), **data)
+
+    def saved_raffle(self):
+        """Estado del diario si corresponde a un sorteo sin terminar de los datos cargados; si no, None."""
+        return unfinished_raffle(self.data_digest, len(self.participants))
+
+    def get_history(self):
+        """Historial de ganadores entre sorteos (se abre al primer uso)."""
+        if self.history is None:
+            self.history = WinnersHistory(HISTORY_PATH)
+        return self.history
+
+    def record_winners(self, winners):
+        """Agrega ganadores confirmados al historial (por la columna clave KEY_FIELD)."""
+        if self.history_event is None:
+            return
+        key = KEY_FIELD or self.headers[0]
+        self.get_history().add(self.history_event,
+                               [(self.participants.value(w.position, key, None), w.prize) for w in winners])
+
+    def on_field_1(self, instance, value):
+        """El giro muestra el Campo 1: se rehace el buffer si cambia."""
+        self.build_spin_labels()
+
+    def build_spin_labels(self):
+        """
+        Precalcula los textos del giro (en mayúsculas y con markup) a partir de una
+        muestra aleatoria de participantes, para no recorrer toda la lista en cada sorteo.
+        """
+        if not self.participants:
+            self.spin_labels = []
+            return
+        n = len(self.participants)
+        positions = random.sample(range(n), min(SPIN_BUFFER_SIZE, n))
+        names = self.participants.column(self.field_1)
+        if names is not None:
+            texts = (str(names[p]) for p in positions)
+        else:
+            texts = (f"ID: {self.participants.value(p, 'ID')}" for p in positions)
+        self.spin_labels = [f"[b]>>> [color=00AEEF]{t.upper()}[/color] <<<[/b]" for t in texts]
+
     # FUNCIÓN MODIFICADA: Asegura el orden ascendente de premio (#1, #2, #3, ...)
     def show_winners_list(self):
         """Muestra la pantalla con la lista de ganadores, ordenados de Premio #1 al Premio #N."""
@@ -165,14 +305,12 @@ class RaffleApp(App):
             self.raffle_screen.show_status_message("NO HAY GANADORES CONFIRMADOS.", (1, 0.6, 0.0, 1))
             return
         
-        # CORRECCIÓN DE REQUISITO: Ordenar la lista para la pantalla de mayor a menor premio (Premio #1 al Premio #N).
-        # El campo 'prize' guarda el número de premio que se sorteó (ej: 5, 4, 3, 2, 1)
-        # Usar 'key=lambda x: -x['prize']' invierte el orden de los números (de -5 a -1), resultando en 1, 2, 3, 4, 5.
-        # Esto asegura que el Premio #1 (el mejor) aparezca primero.
-        ordered_winners = sorted(self.winners, key=lambda x: -x['prize']) 
-
-        # Cargar los datos ordenados y cambiar de pantalla
-        self.winners_list_screen.load_winners(ordered_winners)
+        # La lista se mantiene al día al confirmar cada ganador (add_winner); solo se
+        # reconstruye si cambiaron los campos a mostrar desde entonces.
+        if self.winners_list_screen.shown_fields != (self.field_1, self.field_2):
+            # Orden ascendente por número de premio: Premio #1 (el mejor) aparece primero.
+            ordered_winners = sorted(self.winners, key=lambda x: x.prize)
+            self.winners_list_screen.load_winners(ordered_winners)
         self.sm.current = 'winners_list'
         
     # NUEVA FUNCIÓN: Exportación real a Excel (llamada desde WinnersListScreen)
@@ -185,9 +323,11 @@ class RaffleApp(App):
         try:
             export_data = []
             for item in self.winners:
-                # item['prize'] es el número de premio (1 es el mejor, N es el peor)
-                row = {'Premio': f"Ganador #{item['prize']}"}
-                row.update(item['data'])
+                # item.prize es el número de premio (1 es el mejor, N es el peor)
+                row = {'Premio': f"Ganador #{item.prize}"}
+                if item.tier is not None:
+                    row['Categoría'] = item.tier
+                row.update(self.participants.row(item.position)) # La fila se materializa recién al exportar
                 export_data.append(row)
 
             df_winners = pd.DataFrame(export_data)
@@ -215,25 +355,141 @@ class RaffleApp(App):
             return
 
         self.winners = []
+        self.winners_list_screen.load_winners([])
+        try:
+            self.tiers = [PrizeTier.parse(spec) for spec in PRIZE_TIERS]
+        except ValueError as e:
+            self.setup_screen.show_message(f"CATEGORÍAS NO VÁLIDAS: {e}", (1, 0, 0, 1))
+            return
+        self.quota = None
+        if QUOTA_FIELD and not self.tiers:
+            if QUOTA_FIELD not in self.headers:
+                self.setup_screen.show_message(f"COLUMNA DE CUOTA NO ENCONTRADA: {QUOTA_FIELD}", (1, 0, 0, 1))
+                return
+            needed = len(self.group_index(QUOTA_FIELD)) * QUOTA_MIN
+            if needed > self.num_winners:
+                self.setup_screen.show_message(f"LA CUOTA PIDE {needed} GANADORES Y HAY {self.num_winners} PREMIOS.",
+                                               (1, 0, 0, 1))
+                return
+            self.quota = {"field": QUOTA_FIELD, "min": QUOTA_MIN}
+        self.build_pool()
+        self.rng = RaffleRng(self.rng_seed)
         # current_prize_index controla cuántos premios se han sorteado (0 al inicio)
         self.current_prize_index = 0 
+        # Evento propio en el historial (solo con datos reales, no en simulación). Como en
+        # SharedRaffle.reset: si se empieza de nuevo un sorteo sin terminar de estos datos, sus
+        # ganadores se borran del historial y la vuelta nueva usa el mismo evento
+        saved = self.saved_raffle()
+        previous = saved["start"].get("history_event") if saved else None
+        if previous is not None:
+            self.get_history().clear(previous)
+        self.history_event = previous or (f"{self.data_digest}:{time.time_ns()}" if self.data_digest else None)
+        self.log_event("start", digest=self.data_digest, n=len(self.participants),
+                       num_winners=self.num_winners, weight_field=self.weight_field,
+                       history_event=self.history_event, tiers=[t.to_dict() for t in self.tiers],
+                       quota=self.quota)
         self.winner_revealed = False
         self.is_drawing = False
         self.sm.current = 'raffle'
+        self.raffle_screen.export_button.disabled = True
         # Al cambiar de pantalla, se llama a update_display, que a su vez llama a clear_winner_display
+        # (habilita exportar si ya no hay premio con participantes)
         self.raffle_screen.update_display() 
-        self.raffle_screen.export_button.disabled = True
+        if self.raffle_finished():
+            self.finish_raffle()
+
+    def build_pool(self):
+        """Pool del sorteo (con pesos si hay columna de peso); con categorías, uno por categoría."""
+        weights = self.participants.weights(self.weight_field) if self.weight_field else None
+        if self.tiers:
+            # Una partición por columna y un pool por categoría; la cantidad de premios es su suma
+            self.pool = TierDraw(self.participants, self.tiers, weights, self.eligible)
+            self.num_winners = self.pool.num_winners
+        else:
+            self.pool = make_pool(len(self.participants), weights, self.eligible)
+
+    def group_index(self, field):
+        """Grupos de la columna `field` (los de la carga si es la misma columna)."""
+        if self.groups is None or self.groups.field != field:
+            self.groups = GroupIndex(self.participants, field)
+        return self.groups
+
+    def resume_raffle(self):
+        """Reanuda el sorteo guardado en el diario (ganadores confirmados y flujo aleatorio)."""
+        state = self.saved_raffle()
+        if state is None:
+            self.setup_screen.show_message("NO HAY SORTEO PARA REANUDAR.", (1, 0.6, 0.0, 1))
+            return
+
+        self.num_winners = state["num_winners"]
+        self.weight_field = state["weight_field"] or ''
+        self.tiers = [PrizeTier.from_dict(d) for d in state["tiers"] or []]
+        self.quota = state["quota"]
+        self.build_pool()
+        self.rng = RaffleRng.from_dict(state["rng"])
+        self.history_event = state["start"].get("history_event")
+        # Un candidato sin confirmar vuelve al pool: se sortea de nuevo ese premio
+        self.winners = [Winner.from_record(rec) for rec in state["winners"]]
+        for item in self.winners:
+            self.pool.remove(item.position)
+        self.winners_list_screen.load_winners(sorted(self.winners, key=lambda x: x.prize))
+        self.current_prize_index = len(self.winners)
+        if state["candidate"] is not None:
+            self.log_event("redraw")
+
+        self.winner_revealed = False
+        self.is_drawing = False
+        self.sm.current = 'raffle'
+        self.raffle_screen.update_display()
+        if self.raffle_finished():
+            self.finish_raffle()
+            return
+        self.raffle_screen.show_status_message(
+            f"SORTEO REANUDADO: {self.current_prize_index} DE {self.num_winners} CONFIRMADOS.",
+            COLOR_METTATEC_ACCENT
+        )
+
+    def next_prize_value(self):
+        """
+        Premio a sortear: del #N al #1 (con categorías, el mayor que aún no tiene
+        ganador y cuya categoría tiene participantes; None si no queda ninguno).
+        """
+        if not self.tiers:
+            return self.num_winners - self.current_prize_index
+        return self.pool.next_prize({w.prize for w in self.winners}, descending=True)
+
+    def raffle_finished(self):
+        """
+        True si ya no hay premio que sortear: todos entregados o, sin un ganador esperando
+        confirmación, ninguno con participantes (categorías agotadas o pool vacío).
+        """
+        if self.current_prize_index >= self.num_winners:
+            return True
+        if self.is_drawing or self.winner_revealed:
+            return False
+        return not self.pool or self.next_prize_value() is None
+
+    def finish_raffle(self):
+        """Muestra el sorteo como terminado; si quedaron premios sin ganador, lo anota en el diario."""
+        if self.current_prize_index < self.num_winners:
+            self.log_event("finish")
+            self.raffle_screen.show_status_message(
+                f"¡SORTEO COMPLETO! {self.num_winners - self.current_prize_index} PREMIOS SIN PARTICIPANTES.",
+                COLOR_METTATEC_PRIMARY
+            )
+        else:
+            self.raffle_screen.show_status_message("¡SORTEO COMPLETO!", COLOR_METTATEC_PRIMARY)
 
     def draw_winner(self):
         """Realiza el sorteo de un solo ganador, iniciando la animación."""
         
         # El número de premio actual que se está sorteando (ej: si N=5 y se sorteó 0, sorteamos el 5)
         # Sorteamos N, N-1, ..., 2, 1.
-        current_prize_value = self.num_winners - self.current_prize_index
+        current_prize_value = self.next_prize_value()
         
-        if self.current_prize_index >= self.num_winners:
+        if self.raffle_finished():
             # Mensaje menos intrusivo, ya que se asume que esto se llama por error
-            self.raffle_screen.show_status_message("¡SORTEO FINALIZADO! TODOS LOS PREMIOS ENTREGADOS.", COLOR_METTATEC_PRIMARY)
+            self.raffle_screen.show_status_message("¡SORTEO FINALIZADO! NO QUEDAN PREMIOS POR SORTEAR.", COLOR_METTATEC_PRIMARY)
             return
 
         if self.is_drawing or self.winner_revealed:
@@ -242,34 +498,82 @@ class RaffleApp(App):
 
         self.is_drawing = True
         
-        # 1. Seleccionar un ganador de los participantes restantes
-        drawn_participants = [w['data'] for w in self.winners]
-        # Filtrar participantes que ya están en la lista de ganadores
-        available_participants = [p for p in self.participants if p not in drawn_participants]
-        
-        if not available_participants:
+        # 1. Seleccionar un ganador de los participantes restantes (pool por posición de fila;
+        # con categorías, el pool de la categoría del premio)
+        pool = self.pool.pool_for(current_prize_value) if self.tiers and current_prize_value else self.pool
+        if not pool or current_prize_value is None:
             self.raffle_screen.show_status_message("¡NO QUEDAN PARTICIPANTES DISPONIBLES!", (1, 0, 0, 1))
             self.is_drawing = False
             return
 
-        winner = random.choice(available_participants)
+        if self.quota:
+            # Con cuotas pendientes y premios justos, el ganador sale de un grupo que las tenga
+            # (quota_pick ya mide su "draw")
+            position = quota_pick(pool, self.group_index(self.quota["field"]), self.quota["min"],
+                                  [w.position for w in self.winners],
+                                  self.num_winners - self.current_prize_index, self.rng)
+        else:
+            with metrics.timed("draw"):
+                position = pool.pick(self.rng)
+        # Sale del pool (de todas las categorías) mientras espera confirmación; redraw_winner lo reinserta
+        pool.remove(position)
         
-        # 2. Registrar el ganador temporalmente (mientras espera confirmación)
-        self.winners.append({
-            'prize': current_prize_value, # Registra el valor real del premio (ej: 5, 4, 3...)
-            'data': winner
-        })
+        # 2. Registrar el ganador temporalmente (mientras espera confirmación): solo el valor
+        # real del premio (ej: 5, 4, 3...), la posición de la fila en participants y la categoría
+        tier = self.tiers[self.pool.tier_of(current_prize_value)].name if self.tiers else None
+        self.winners.append(Winner(current_prize_value, position, tier=tier))
+        winner = self.participants.row(position) # Solo se materializa la fila a mostrar
+        self.log_event("draw", **winner_record(self.winners[-1]))
         
         # 3. Iniciar la animación en la pantalla de sorteo
         self.raffle_screen.animate_draw(winner)
 
+    def draw_all_winners(self):
+        """Sortea de una vez todos los premios restantes, ya confirmados (resultados instantáneos)."""
+        if self.is_drawing or self.winner_revealed or self.raffle_finished():
+            return
+
+        remaining = self.num_winners - self.current_prize_index
+        with metrics.timed("draw_many"):
+            if self.tiers:
+                # Todas las categorías que faltan, una tras otra
+                drawn = self.pool.draw_all(self.rng, awarded={w.prize for w in self.winners})
+            else:
+                if self.quota:
+                    # Cuota de cada grupo (sobre sus posiciones precalculadas) y el resto del pool completo
+                    positions = quota_draw(self.pool, self.group_index(self.quota["field"]), self.quota["min"],
+                                           remaining, self.rng, taken=[w.position for w in self.winners])
+                else:
+                    # Fisher-Yates parcial sobre el pool: una sola pasada para todos los premios
+                    positions = self.pool.take(remaining, self.rng)
+                # Mismo orden que el sorteo uno a uno: Premio #N, #N-1, ..., #1
+                first_prize = self.num_winners - self.current_prize_index
+                drawn = [Winner(first_prize - i, position) for i, position in enumerate(positions)]
+        if not drawn:
+            self.raffle_screen.show_status_message("¡NO QUEDAN PARTICIPANTES DISPONIBLES!", (1, 0, 0, 1))
+            return
+
+        self.winners.extend(drawn)
+        self.current_prize_index += len(drawn)
+        self.log_event("draw_many", winners=[winner_record(w) for w in drawn])
+        self.record_winners(drawn)
+        self.winners_list_screen.load_winners(sorted(self.winners, key=lambda x: x.prize))
+
+        self.raffle_screen.clear_winner_display()
+        self.raffle_screen.update_display()
+        # Tras sortear todo lo posible no queda premio sorteable (aunque alguno quede sin ganador)
+        self.finish_raffle()
+
     def confirm_winner(self):
         """Confirma el ganador actual y avanza al siguiente premio."""
         if self.winner_revealed:
             # Obtener el número de premio del ganador que se está confirmando (almacenado en draw_winner)
-            confirmed_prize_value = self.winners[-1]['prize'] # Premio #N (ej. 5, 4, 3...)
+            confirmed_prize_value = self.winners[-1].prize # Premio #N (ej. 5, 4, 3...)
 
-            # El ganador ya está en self.winners
+            # El ganador ya está en self.winners; se agrega a la lista visible sin reconstruirla
+            self.winners_list_screen.add_winner(self.winners[-1])
+            self.log_event("confirm", **winner_record(self.winners[-1]))
+            self.record_winners([self.winners[-1]])
             self.current_prize_index += 1 # Avanza al siguiente sorteo (ej: 1 al 2)
             self.winner_revealed = False
             self.is_drawing = False
@@ -281,14 +585,11 @@ class RaffleApp(App):
             self.raffle_screen.clear_winner_display()
             self.raffle_screen.update_display() 
 
-            # Habilita exportar si es el último premio
-            if self.current_prize_index >= self.num_winners:
+            # Habilita exportar si es el último premio (o si los que quedan no tienen participantes)
+            if self.raffle_finished():
                 self.raffle_screen.export_button.disabled = False
                 # 4. Eliminación de mensaje de botón final, solo se deja el estado de sorteo completo.
-                self.raffle_screen.show_status_message(
-                    "¡SORTEO COMPLETO!", 
-                    COLOR_METTATEC_PRIMARY
-                )
+                self.finish_raffle()
             else:
                  # 2. Nuevo mensaje de confirmación
                  self.raffle_screen.show_status_message(
@@ -301,11 +602,13 @@ class RaffleApp(App):
         """Descarta el último ganador sorteado sin avanzar de premio."""
         if self.winner_revealed:
             # El número de premio que se está sorteando actualmente (no avanza)
-            current_prize_value = self.num_winners - self.current_prize_index
+            current_prize_value = self.winners[-1].prize if self.winners else self.next_prize_value()
 
-            # 1. Quitar al ganador de la lista de ganadores (para que pueda volver a ser elegido)
+            # 1. Quitar al ganador de la lista de ganadores y devolverlo al pool (para que pueda volver a ser elegido)
             if self.winners:
-                self.winners.pop() 
+                discarded = self.winners.pop()
+                self.pool.add(discarded.position)
+                self.log_event("redraw")
             
             # 2. Resetear estados
             self.winner_revealed = False
@@ -327,17 +630,16 @@ class RaffleApp(App):
         Calcula el tamaño de fuente y el texto del premio.
         El sorteo va del menor valor (Premio #N) al mayor valor (Premio #1).
         """
-        # El número total de premios ya sorteados/confirmados
-        prizes_confirmed = self.current_prize_index
-        
         # Tamaño de fuente fijo para el título del premio (el más grande)
         font_size = dp(36) 
 
-        if prizes_confirmed >= self.num_winners:
+        if self.raffle_finished():
             return "¡SORTEO COMPLETO!", font_size
 
         # El premio actual que se está sorteando (ej: si N=5 y confirmed=0, prize_value=5)
-        prize_value = self.num_winners - prizes_confirmed
+        prize_value = self.next_prize_value()
+        if prize_value is None:
+            return "¡NO QUEDAN PARTICIPANTES!", font_size
 
         return f"PREMIO # {prize_value}", font_size
     
@@ -408,7 +710,7 @@ class SetupScreen(Screen):
             color=COLOR_TEXT_LIGHT,
             font_size=dp(16)
         )
-        load_button.bind(on_release=lambda x: app.load_data())
+        load_button.bind(on_release=lambda x: self.open_file_chooser())
         self.layout.add_widget(load_button)
         
         self.message_label = Label(text="", size_hint_y=None, height=dp(30), font_size=dp(14))
@@ -425,7 +727,7 @@ class SetupScreen(Screen):
 
 
         # 3. Coincidir campos de identificación (Grid 2x2)
-        field_layout = GridLayout(cols=2, size_hint_y=None, height=dp(120), spacing=dp(10), padding=dp(5))
+        field_layout = GridLayout(cols=2, size_hint_y=None, height=dp(170), spacing=dp(10), padding=dp(5))
         
         # Etiquetas simplificadas: CAMPO 1
         field_layout.add_widget(Label(text="CAMPO 1:", color=COLOR_TEXT_DARK, size_hint_x=0.4))
@@ -453,6 +755,21 @@ class SetupScreen(Screen):
         )
         self.field_spinner_2.bind(text=lambda instance, value: setattr(app, 'field_2', value))
         field_layout.add_widget(self.field_spinner_2)
+
+        # PESO (opcional): columna numérica con boletos/puntos de cada participante
+        field_layout.add_widget(Label(text="PESO:", color=COLOR_TEXT_DARK, size_hint_x=0.4))
+        self.weight_spinner = Spinner(
+            text=NO_WEIGHT_LABEL,
+            values=[NO_WEIGHT_LABEL] + list(app.headers),
+            background_normal='',
+            background_color=COLOR_METTATEC_PRIMARY,
+            color=COLOR_TEXT_LIGHT,
+            size_hint_x=0.6
+        )
+        self.weight_spinner.bind(
+            text=lambda instance, value: setattr(app, 'weight_field', '' if value == NO_WEIGHT_LABEL else value)
+        )
+        field_layout.add_widget(self.weight_spinner)
         
         self.layout.add_widget(field_layout)
 
@@ -484,9 +801,67 @@ class SetupScreen(Screen):
         )
         start_button.bind(on_release=lambda x: app.start_raffle())
         self.layout.add_widget(start_button)
+        self.start_button = start_button
+
+        # Reanudar un sorteo sin terminar (desde el diario), p. ej. tras un cierre inesperado
+        self.resume_button = Button(
+            text="REANUDAR SORTEO GUARDADO",
+            size_hint_y=None,
+            height=dp(40),
+            background_normal='',
+            background_color=COLOR_METTATEC_ACCENT,
+            color=COLOR_TEXT_LIGHT,
+            font_size=dp(14),
+            disabled=True
+        )
+        self.resume_button.bind(on_release=lambda x: app.resume_raffle())
+        self.layout.add_widget(self.resume_button)
         
         self.layout.add_widget(Label(size_hint_y=0.5)) 
 
+        # Mientras se cargan datos en segundo plano no se puede iniciar ni volver a cargar
+        self.load_button = load_button
+        app.bind(is_loading=self.on_loading_change)
+        self.on_loading_change(app, app.is_loading)
+
+    def on_loading_change(self, app, loading):
+        self.load_button.disabled = loading
+        self.start_button.disabled = loading
+        if loading:
+            self.resume_button.disabled = True
+
+    def open_file_chooser(self):
+        """Permite elegir otro archivo de participantes; se carga en segundo plano."""
+        app = App.get_running_app()
+        content = BoxLayout(orientation='vertical', spacing=dp(10))
+        chooser = FileChooserListView(
+            path=os.getcwd(),
+            filters=['*.xlsx', '*.csv', '*.parquet', '*.feather'],
+            # Varias planillas (o una carpeta entera) se unen en una sola lista
+            multiselect=True,
+            dirselect=True,
+        )
+        if os.path.exists(INPUT_FILENAME):
+            chooser.selection = [os.path.abspath(INPUT_FILENAME)]
+        content.add_widget(chooser)
+
+        buttons = BoxLayout(size_hint_y=None, height=dp(50), spacing=dp(10))
+        popup = Popup(title="ELEGIR ARCHIVO DE PARTICIPANTES", content=content, size_hint=(0.95, 0.9))
+
+        def load_selected(*args):
+            if chooser.selection:
+                popup.dismiss()
+                app.load_data(chooser.selection[0] if len(chooser.selection) == 1 else list(chooser.selection))
+
+        load = Button(text="CARGAR", background_normal='', background_color=COLOR_METTATEC_ACCENT, color=COLOR_TEXT_LIGHT)
+        load.bind(on_release=load_selected)
+        cancel = Button(text="CANCELAR", background_normal='', background_color=COLOR_METTATEC_PRIMARY, color=COLOR_TEXT_LIGHT)
+        cancel.bind(on_release=lambda x: popup.dismiss())
+        buttons.add_widget(load)
+        buttons.add_widget(cancel)
+        content.add_widget(buttons)
+        popup.open()
+
     def on_slider_value_change(self, instance, value):
         """Actualiza la propiedad y la etiqueta del número de ganadores."""
         app = App.get_running_app()
@@ -497,6 +872,8 @@ class SetupScreen(Screen):
         """Actualiza las opciones de los Spinners cuando se cargan nuevos datos."""
         self.field_spinner_1.values = headers
         self.field_spinner_2.values = headers
+        self.weight_spinner.values = [NO_WEIGHT_LABEL] + list(headers)
+        self.weight_spinner.text = NO_WEIGHT_LABEL
         if headers:
             self.field_spinner_1.text = headers[1] if len(headers) > 1 else headers[0]
             self.field_spinner_2.text = headers[2] if len(headers) > 2 else headers[0]
@@ -519,7 +896,7 @@ class RaffleScreen(Screen):
         self.add_widget(self.layout)
         self.build_ui()
         self.spin_event = None
-        self.spinning_names = []
+        self._spin_tick = 0
         # Vincula el tamaño de la pantalla para ajustar el tamaño del texto al ancho disponible
         self.bind(size=self._update_label_size) 
         
@@ -615,6 +992,19 @@ class RaffleScreen(Screen):
         )
         self.draw_button.bind(on_release=lambda x: app.draw_winner())
         self.layout.add_widget(self.draw_button)
+
+        # Sorteo de todos los premios restantes en un solo paso
+        self.draw_all_button = Button(
+            text="SORTEAR TODOS LOS PREMIOS RESTANTES",
+            size_hint_y=None,
+            height=dp(40),
+            background_normal='',
+            background_color=COLOR_METTATEC_PRIMARY,
+            color=COLOR_TEXT_LIGHT,
+            font_size=dp(14)
+        )
+        self.draw_all_button.bind(on_release=lambda x: app.draw_all_winners())
+        self.layout.add_widget(self.draw_all_button)
         
         # 5. Nuevos botones de acción (Confirmar/Redraw)
         action_layout = BoxLayout(size_hint_y=None, height=dp(50), spacing=dp(10))
@@ -677,30 +1067,38 @@ class RaffleScreen(Screen):
         """Prepara e inicia la animación de selección de ganador."""
         app = App.get_running_app()
         self.draw_button.disabled = True 
+        self.draw_all_button.disabled = True
         self.export_button.disabled = True
         self.confirm_button.disabled = True
         self.redraw_button.disabled = True
         # Mensaje de giro
         self.winner_details_label.text = "[i]¡GIRANDO PARA ENCONTRAR AL AFORTUNADO![/i]" # MAYÚSCULAS
 
-        # Obtener nombres para la animación
-        self.spinning_names = [p.get(app.field_1, f"ID: {p.get('ID', 'N/A')}") for p in app.participants]
-        if not self.spinning_names:
+        # Los nombres de la animación ya están precalculados (app.spin_labels)
+        if not app.spin_labels:
             app.is_drawing = False
             return
 
-        # Inicia el giro (actualiza cada 50ms)
-        self.spin_event = Clock.schedule_interval(self._spin_name, 0.05)
+        # Inicia el giro (actualiza cada SPIN_INTERVAL) desde un punto al azar del buffer
+        self._spin_tick = random.randrange(len(app.spin_labels))
+        self._spin_started = time.perf_counter()
+        self.spin_event = Clock.schedule_interval(self._spin_name, SPIN_INTERVAL)
         
         # Programa la detención después de 2.5 segundos para revelar el ganador
         Clock.schedule_once(lambda dt: self._stop_spin(final_winner, dt), 2.5)
 
     def _spin_name(self, dt):
-        """Cicla la etiqueta de nombre con nombres aleatorios."""
-        if self.spinning_names:
-            random_name = random.choice(self.spinning_names)
-            # Formato llamativo durante el giro
-            self.winner_name_label.text = f"[b]>>> [color=00AEEF]{random_name.upper()}[/color] <<<[/b]"
+        """Cicla la etiqueta de nombre por el buffer precalculado de nombres aleatorios."""
+        labels = App.get_running_app().spin_labels
+        if labels:
+            self.winner_name_label.text = labels[self._spin_tick % len(labels)]
+            self._spin_tick += 1
+        if metrics.enabled():
+            # dt de Kivy: tiempo real desde el cuadro anterior; cada intervalo de más es un cuadro perdido
+            metrics.count("spin_frames")
+            dropped = int(dt / SPIN_INTERVAL + 0.5) - 1
+            if dropped > 0:
+                metrics.count("spin_frame_drops", dropped)
             
     def _stop_spin(self, final_winner, dt):
         """Detiene la animación y revela el ganador real, esperando confirmación."""
@@ -709,13 +1107,15 @@ class RaffleScreen(Screen):
         if self.spin_event:
             self.spin_event.cancel()
             self.spin_event = None
+            metrics.observe("spin_seconds", time.perf_counter() - self._spin_started)
             
         # 1. Revelar el ganador final y cambiar estado a esperando confirmación
             app.winner_revealed = True
             app.is_drawing = False
         
             self.winner_name_label.color = COLOR_TEXT_LIGHT 
-            self.update_display(final_winner)
+            with metrics.timed("reveal_render", app="kivy"):
+                self.update_display(final_winner)
         
         
     def clear_winner_display(self):
@@ -791,8 +1191,8 @@ class RaffleScreen(Screen):
         self.history_label.text = f"GANADORES CONFIRMADOS: {num_confirmed} DE {app.num_winners}"
         self.history_label.color = COLOR_TEXT_DARK # Asegurar que el color sea oscuro por defecto
 
-        # 4. Deshabilitar todo si el sorteo ha terminado
-        if app.current_prize_index >= app.num_winners:
+        # 4. Deshabilitar todo si el sorteo ha terminado (o no queda premio con participantes)
+        if app.raffle_finished():
             self.draw_button.text = "SORTEO TERMINADO"
             self.draw_button.disabled = True
             self.draw_button.background_color = (0.5, 0.5, 0.5, 1) # Gris
@@ -806,6 +1206,9 @@ class RaffleScreen(Screen):
             # Se elimina el mensaje final largo. El status ya fue establecido en confirm_winner.
             # Se restablece el color del contador para el estado final.
             self.history_label.color = COLOR_TEXT_DARK
+
+        # "Sortear todos" solo está disponible cuando se puede sortear
+        self.draw_all_button.disabled = self.draw_button.disabled
     
     def show_status_message(self, text, color):
         """Muestra el mensaje de feedback en la etiqueta de historial (pequeño)."""
@@ -813,12 +1216,56 @@ class RaffleScreen(Screen):
         self.history_label.color = color
             
 
+# --- Fila reciclable de la lista de ganadores ---
+class WinnerRow(BoxLayout):
+    """Tarjeta de un ganador. La RecycleView reutiliza estas filas al desplazarse."""
+    prize_text = StringProperty('')
+    details_text = StringProperty('')
+
+    def __init__(self, **kw):
+        super().__init__(orientation='vertical', padding=dp(8), spacing=dp(2), **kw)
+
+        # Fondo de la tarjeta
+        with self.canvas.before:
+            Color(0.9, 0.9, 0.9, 1) # Gris claro
+            self.rect = RoundedRectangle(pos=self.pos, size=self.size, radius=[dp(5)])
+        self.bind(pos=self._update_rect, size=self._update_rect)
+
+        # Título del premio
+        self.prize_label = Label(
+            markup=True,
+            halign='left',
+            color=COLOR_METTATEC_PRIMARY,
+            size_hint_y=None, height=dp(20)
+        )
+        # Detalles del ganador (Campo 1 + Campo 2)
+        self.details_label = Label(
+            markup=True,
+            halign='left',
+            color=COLOR_TEXT_DARK,
+            size_hint_y=None, height=dp(30)
+        )
+        for label in (self.prize_label, self.details_label):
+            # El texto se ajusta al ancho disponible de la fila
+            label.bind(width=lambda instance, width: setattr(instance, 'text_size', (width, None)))
+            self.add_widget(label)
+
+        self.bind(prize_text=self.prize_label.setter('text'), details_text=self.details_label.setter('text'))
+
+    def _update_rect(self, instance, value):
+        self.rect.pos = instance.pos
+        self.rect.size = instance.size
+
+
 # --- NUEVA PANTALLA: Lista de Ganadores ---
 class WinnersListScreen(Screen):
     
     def __init__(self, **kw):
         super().__init__(**kw)
         self.winners_data = []
+        self._prizes = []
+        # Campos con los que se armó la lista (si cambian, se reconstruye al mostrarla)
+        self.shown_fields = None
         self.layout = BoxLayout(orientation='vertical')
         self.layout.bind(size=self.update_gradient)
         self.add_widget(self.layout)
@@ -856,13 +1303,16 @@ class WinnersListScreen(Screen):
         
         main_layout.add_widget(Label(size_hint_y=None, height=dp(1), color=COLOR_METTATEC_PRIMARY))
 
-        # 2. Contenedor de la lista (dentro de un ScrollView)
-        scroll_view = ScrollView(size_hint=(1, 1), do_scroll_x=False)
-        # CORRECCIÓN 1: Añadir size_hint_x=1
-        self.winners_container = BoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None, size_hint_x=1, padding=(dp(0), dp(5)))
-        self.winners_container.bind(minimum_height=self.winners_container.setter('height'))
-        scroll_view.add_widget(self.winners_container)
-        main_layout.add_widget(scroll_view)
+        # 2. Contenedor de la lista (RecycleView: solo se crean widgets para las filas visibles)
+        self.winners_view = RecycleView(size_hint=(1, 1), do_scroll_x=False)
+        self.winners_view.viewclass = WinnerRow
+        rows_layout = RecycleBoxLayout(
+            orientation='vertical', spacing=dp(10), padding=(dp(0), dp(5)),
+            default_size=(None, dp(60)), default_size_hint=(1, None), size_hint_y=None
+        )
+        rows_layout.bind(minimum_height=rows_layout.setter('height'))
+        self.winners_view.add_widget(rows_layout)
+        main_layout.add_widget(self.winners_view)
 
         # --- MODIFICACIÓN: Añadir logo antes de la etiqueta del creador ---
         logo_footer = Image(
@@ -894,73 +1344,38 @@ class WinnersListScreen(Screen):
         
         self.layout.add_widget(main_layout)
 
-    def load_winners(self, ordered_winners):
-        """Carga y visualiza los ganadores en la lista. Se asume que ya vienen ordenados (Premio #1, #2, ...)."""
-        app = App.get_running_app()
-        self.winners_data = ordered_winners
-        self.winners_container.clear_widgets()
-        self.message_label.text = "By Randy Mucha" # Restablecer mensaje
+    def on_pre_enter(self, *args):
+        """Restablece el mensaje del pie al entrar a la pantalla."""
+        self.message_label.text = "By Randy Mucha"
         self.message_label.color = COLOR_METTATEC_PRIMARY
 
-        # Calcular el ancho disponible para el texto:
-        # Ancho total de la pantalla (self.width) 
-        #   - padding principal de main_layout (2 * dp(20) = dp(40)) 
-        #   - padding horizontal de winner_box (2 * dp(8) = dp(16))
-        # Total de padding y margen = dp(56). 
-        # CORRECCIÓN 3.1: Cálculo más preciso del ancho de texto disponible
-        text_available_width = self.width - dp(56) 
-
-        for item in self.winners_data:
-            prize_num = item['prize']
-            winner_data = item['data']
-            
-            # Combinación de Campo 1 + Campo 2
-            f1_content = winner_data.get(app.field_1, 'N/A').upper()
-            f2_content = winner_data.get(app.field_2, 'N/A').upper()
-            
-            # Contenedor para cada ganador
-            # CORRECCIÓN 3.2: Reducir altura y ajustar padding
-            winner_box = BoxLayout(orientation='vertical', size_hint_y=None, height=dp(60), padding=dp(8), spacing=dp(2))
-            
-            # Fondo de la tarjeta
-            with winner_box.canvas.before:
-                from kivy.graphics import Color, RoundedRectangle
-                Color(0.9, 0.9, 0.9, 1) # Gris claro
-                self.rect = RoundedRectangle(pos=winner_box.pos, size=winner_box.size, radius=[dp(5)])
-                winner_box.bind(pos=self._update_rect_winner, size=self._update_rect_winner)
-                
-            # Título del premio
-            prize_label = Label(
-                text=f"[b]PREMIO #{prize_num}:[/b]", 
-                markup=True,
-                halign='left',
-                color=COLOR_METTATEC_PRIMARY,
-                size_hint_y=None, height=dp(20), # CORRECCIÓN 3.3: Altura reducida
-                # CORRECCIÓN 3.4: Usar el ancho calculado
-                text_size=(text_available_width, None) 
-            )
-            
-            # Detalles del ganador (Campo 1 + Campo 2)
-            winner_details_label = Label(
-                text=f"{f1_content} ({f2_content})", # FORMATO: Campo 1 (Campo 2)
-                markup=True,
-                halign='left',
-                color=COLOR_TEXT_DARK,
-                size_hint_y=None, height=dp(30), # CORRECCIÓN 3.5: Altura reducida
-                # CORRECCIÓN 3.6: Usar el ancho calculado
-                text_size=(text_available_width, None) 
-            )
+    def _row_data(self, item):
+        """Datos de una fila de la RecycleView: Campo 1 + Campo 2 leídos del almacén por posición."""
+        app = App.get_running_app()
+        f1_content = str(app.participants.value(item.position, app.field_1)).upper()
+        f2_content = str(app.participants.value(item.position, app.field_2)).upper()
+        return {
+            'prize_text': f"[b]PREMIO #{item.prize}{' · ' + item.tier.upper() if item.tier else ''}:[/b]",
+            'details_text': f"{f1_content} ({f2_content})", # FORMATO: Campo 1 (Campo 2)
+        }
 
-            winner_box.add_widget(prize_label)
-            winner_box.add_widget(winner_details_label)
-            self.winners_container.add_widget(winner_box)
+    def load_winners(self, ordered_winners):
+        """Carga los ganadores en la lista. Se asume que ya vienen ordenados (Premio #1, #2, ...)."""
+        app = App.get_running_app()
+        with metrics.timed("winners_list_build", app="kivy"):
+            self.winners_data = list(ordered_winners)
+            self._prizes = [item.prize for item in self.winners_data]
+            self.shown_fields = (app.field_1, app.field_2)
+            self.winners_view.data = [self._row_data(item) for item in self.winners_data]
+        metrics.observe("winners_listed", len(self.winners_data), app="kivy")
+
+    def add_winner(self, item):
+        """Agrega un ganador confirmado en su lugar (orden por premio) sin reconstruir la lista."""
+        idx = bisect.bisect_left(self._prizes, item.prize)
+        self._prizes.insert(idx, item.prize)
+        self.winners_data.insert(idx, item)
+        self.winners_view.data.insert(idx, self._row_data(item))
 
-    def _update_rect_winner(self, instance, value):
-        # Asume que el rectángulo es el último elemento añadido al canvas.before
-        if len(instance.canvas.before.children) >= 2:
-             instance.canvas.before.children[-1].pos = instance.pos
-             instance.canvas.before.children[-1].size = instance.size
-    
     def on_export_to_excel(self, instance):
         """Maneja el evento de exportar la lista a Excel."""
         app = App.get_running_app()
@@ -976,6 +1391,16 @@ class WinnersListScreen(Screen):
             self.export_excel_button.background_color = (0.8, 0.2, 0.2, 1)
 
 if __name__ == '__main__':
+    # Ejecutable empaquetado: los procesos de carga en paralelo no deben volver a abrir la app
+    multiprocessing.freeze_support()
+    # La ventana se crea recién aquí: los procesos de carga (spawn) importan este
+    # módulo y no deben abrir una ventana cada uno
+    from kivy.core.window import Window
+    # Forzar formato vertical para simular dispositivo móvil
+    Window.size = (400, 700)
+    Window.minimum_width = 400
+    Window.minimum_height = 700
+
     # Verificar si el archivo LOGO_METTATEC.png existe, si no, crear un placeholder dummy
     if not os.path.exists('LOGO_METTATEC.png') and platform != 'android' and platform != 'ios':
         print("ADVERTENCIA: ARCHIVO LOGO_METTATEC.png NO ENCONTRADO. LA APLICACIÓN USARÁ UN MARCADOR DE POSICIÓN.")
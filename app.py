@@ -1,51 +1,225 @@
 import streamlit as st
 import pandas as pd
+import hashlib
 from sorteo_logic import (
-    init_state, reset_round, remaining_participants,
-    export_winners_xlsx, pick_candidate, load_excel_3cols
+    init_state, load_excel_3cols_snapshot, file_digest, sources_digest, read_keys, prepare_participants,
 )
+from sorteo_journal import JOURNAL_DIR
+from sorteo_registry import RaffleRegistry
+from sorteo_tiers import parse_tiers, format_tiers
+from sorteo_history import WinnersHistory
+import sorteo_metrics as metrics
+
+# Máximo de planillas distintas que se mantienen parseadas en memoria (LRU)
+PARSED_CACHE_ENTRIES = 8
+# Cada cuántos segundos la pantalla de los espectadores busca cambios
+VIEWER_REFRESH_SECONDS = 2
+# Mensajes para los espectadores según el evento del sorteo
+EVENT_TOASTS = {
+    "draw": "🎯 Nuevo candidato para el Premio #{prize}",
+    "confirm": "✅ ¡Ganador confirmado del Premio #{prize}!",
+    "draw_many": "⚡ Se sortearon todos los premios restantes",
+    "reset": "🔁 El sorteo se reinició",
+}
 
 # --- Configuración Inicial ---
 st.set_page_config(page_title="Sorteo Mettatec", page_icon="🎉", layout="centered")
 init_state()
 s = st.session_state
 
+@st.cache_resource
+def get_registry() -> RaffleRegistry:
+    """Registro único del servidor: todas las sesiones comparten los mismos sorteos."""
+    return RaffleRegistry()
+
+@st.cache_resource
+def get_history() -> WinnersHistory:
+    """Historial de ganadores entre sorteos (SQLite), compartido por todas las sesiones."""
+    return WinnersHistory()
+
+@st.cache_resource(max_entries=PARSED_CACHE_ENTRIES, show_spinner="Leyendo participantes...")
+def load_participants_shared(digest: str, _file) -> pd.DataFrame:
+    """
+    Parsea la planilla (o la lista de planillas, que se unen con sus columnas de
+    procedencia) una sola vez por contenido (clave = hash de los bytes).
+    El DataFrame resultante lo comparten todas las sesiones: es de solo lectura.
+    Tras un reinicio del servidor se mapea la instantánea guardada en lugar de parsear.
+    """
+    with metrics.timed("load", app="web"):
+        return load_excel_3cols_snapshot(_file, digest, JOURNAL_DIR)
+
+@st.cache_resource(max_entries=PARSED_CACHE_ENTRIES, show_spinner="Depurando participantes...")
+def prepare_shared(prep_key: tuple, _df: pd.DataFrame, _exclude: list, _previous: list) -> tuple:
+    """
+    Quita personas de las listas de exclusión / ganadores anteriores (archivos y,
+    si se pide, el historial de los últimos N sorteos) y, si se pide, duplicados
+    por la columna clave. Se calcula una vez por combinación de planilla, columna y listas.
+    """
+    key, last_events, dedup = prep_key[1], prep_key[4], prep_key[5]
+    with metrics.timed("eligibility", app="web"):
+        previous = [read_keys(f, key) for f in _previous]
+        if last_events:
+            # El propio sorteo (mismo id) no cuenta: al reabrirlo debe quedar la misma lista
+            previous.append(get_history().won(_df[key], last_events, exclude_event=raffle_digest_for(prep_key)))
+        return prepare_participants(
+            _df, key,
+            exclude=[read_keys(f, key) for f in _exclude],
+            previous_winners=previous,
+            dedup=dedup,
+        )
+
+def raffle_digest_for(prep_key: tuple) -> str:
+    """Id del sorteo: misma planilla y misma depuración => mismo sorteo (y mismo diario)."""
+    return hashlib.blake2b(repr(prep_key).encode("utf-8"), digest_size=16).hexdigest()
+
+def default_fields(df: pd.DataFrame) -> tuple:
+    """Campos por defecto (2da y 3ra col, ya aseguradas por load_excel_3cols)."""
+    cols = df.columns
+    return (cols[1] if len(cols) > 1 else cols[0], cols[2] if len(cols) > 2 else cols[0])
+
+def show_winners(raffle, field1: str, field2: str, downloads: bool = True):
+    """Tabla de ganadores (y exportaciones); se generan una vez por versión y las comparten todas las sesiones."""
+    if not raffle.winners:
+        st.info("Aún no hay ganadores confirmados.")
+        return
+    st.dataframe(raffle.output("table", field1, field2), use_container_width=True, hide_index=True)
+    if not downloads:
+        return
+
+    cX, cY = st.columns(2)
+    with cX:
+        xls_bytes = raffle.output("xlsx", field1, field2)
+        if xls_bytes:
+            st.download_button(
+                "⬇️ Exportar a Excel",
+                data=xls_bytes,
+                file_name="GANADORES.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+    with cY:
+        csv_bytes = raffle.output("csv", field1, field2)
+        if csv_bytes:
+            st.download_button(
+                "⬇️ Exportar a CSV",
+                data=csv_bytes,
+                file_name="GANADORES.csv",
+                mime="text/csv",
+            )
+
 st.title("🎉 Sorteo Digital – Mettatec")
-st.caption("Sube un archivo Excel de *3 columnas* (por ejemplo: ID, Nombre, Email).")
+registry = get_registry()
+
+# ----------------------------------------------------
+# ===== Modo espectador (?sorteo=<id>, solo lectura) =====
+# ----------------------------------------------------
+viewer_id = st.query_params.get("sorteo")
+if viewer_id:
+    raffle = registry.get(viewer_id)
+    if raffle is None:
+        st.error("El sorteo no existe o ya terminó.")
+        st.stop()
+
+    if s.seen_version is None:
+        # Espectador nuevo: ve el estado actual, sin un aviso por cada evento pasado
+        s.seen_version = raffle.version
+    # Solo se piden los eventos posteriores a la última versión vista por esta sesión
+    version, changes = raffle.changes_since(s.seen_version)
+    for _, event, data in changes:
+        if event in EVENT_TOASTS:
+            st.toast(EVENT_TOASTS[event].format(**data))
+    s.seen_version = version
+
+    field1, field2 = default_fields(raffle.df)
+    st.write(f"Ganadores confirmados: *{raffle.current_index} / {raffle.num_winners}*")
+    cand = raffle.candidate
+    if cand is not None:
+        tier = f" ({cand.tier})" if cand.tier else ""
+        st.success(f"🎯 Candidato para *Premio #{cand.prize}*{tier}: `{raffle.row(cand).get(field1, '')}`")
+    st.subheader("Lista de ganadores")
+    show_winners(raffle, field1, field2, downloads=False)
+
+    @st.fragment(run_every=VIEWER_REFRESH_SECONDS)
+    def watch_changes():
+        # Cada pocos segundos solo se compara la versión: sin cambios no se reenvía nada,
+        # y la página (con la tabla) se vuelve a armar una vez por evento del sorteo
+        if raffle.version != s.seen_version:
+            st.rerun()
+
+    watch_changes()
+    st.stop()
 
 # ----------------------------------
 # ===== 1) Entrada de datos =====
 # ----------------------------------
-up = st.file_uploader("Archivo Excel (.xlsx)", type=["xlsx"])
+st.caption("Sube un archivo Excel (o CSV/Parquet/Feather) con al menos *3 columnas* (por ejemplo: ID, Nombre, "
+           "Email; las demás sirven de peso, categorías o cuotas), o varios con las mismas columnas "
+           "(p. ej. uno por sede): se unen en una sola lista.")
+raffle = registry.get(s.raffle_id) if s.raffle_id else None
+
+FILE_TYPES = ["xlsx", "csv", "parquet", "feather"]
+ups = st.file_uploader("Archivos de participantes", type=FILE_TYPES, accept_multiple_files=True)
+# Con ganadores o un candidato, la semilla (como el peso, la cuota y las categorías) queda fija
+started = raffle is not None and (bool(raffle.winners) or raffle.candidate is not None)
 colA, colB = st.columns(2)
 with colA:
-    seed_opt = st.toggle("Usar semilla (reproducible)", value=False)
+    seed_opt = st.toggle("Usar semilla (reproducible)", value=raffle is not None and raffle.seed is not None,
+                         disabled=started)
 with colB:
-    s.rng_seed = st.number_input("Semilla", min_value=0, value=0, step=1) if seed_opt else None
+    current_seed = raffle.seed if raffle is not None and raffle.seed is not None else 0
+    s.rng_seed = st.number_input("Semilla", min_value=0, value=current_seed, step=1,
+                                 disabled=started) if seed_opt else None
 
-if up is not None:
+if ups:
     try:
-        # Solo cargar si el archivo es diferente al último cargado para evitar bucles
-        if up != s.get('last_uploaded_file'):
-            df = load_excel_3cols(up)
-            s.df = df
-            s.last_uploaded_file = up # Guardar referencia al archivo cargado
-
-            # Reiniciar sorteo si se sube un archivo nuevo
-            s.winners, s.current_index, s.candidate = [], 0, None
-            
-            # Campos por defecto (2da y 3ra col, ya aseguradas por load_excel_3cols)
-            s.field1 = s.df.columns[1] if len(s.df.columns) > 1 else s.df.columns[0]
-            s.field2 = s.df.columns[2] if len(s.df.columns) > 2 else s.df.columns[0]
-            st.success(f"Datos cargados: {s.df.shape[0]} participantes, {s.df.shape[1]} columnas.")
-            st.rerun() # Forzar re-ejecución para limpiar el uploader
+        # Varios archivos se unen siempre en el mismo orden (por nombre): mismos archivos => mismo sorteo
+        ups = sorted(ups, key=lambda f: f.name)
+        up = ups[0] if len(ups) == 1 else ups
+        # Solo hashear si los archivos son diferentes a los últimos cargados
+        file_ids = tuple(f.file_id for f in ups)
+        if file_ids != s.get('last_uploaded_file'):
+            s.data_digest = file_digest(up) if len(ups) == 1 else sources_digest(ups)
+            s.last_uploaded_file = file_ids # Guardar referencia a los archivos cargados
+        source_df = load_participants_shared(s.data_digest, up) # Mismo contenido => mismo DataFrame compartido
+
+        with st.expander("Depuración y elegibilidad"):
+            key_field = st.selectbox("Columna que identifica a cada persona (listas e historial)", source_df.columns.tolist())
+            dedup = st.checkbox("Quitar duplicados (una participación por persona según esa columna)", value=False)
+            exclude_files = st.file_uploader("Listas de exclusión", type=FILE_TYPES, accept_multiple_files=True)
+            previous_files = st.file_uploader("Ganadores de sorteos anteriores", type=FILE_TYPES, accept_multiple_files=True)
+            last_events = st.number_input("Excluir a quienes ganaron en los últimos N sorteos (historial; 0 = no)",
+                                          min_value=0, value=0, step=1)
+
+        prep_key = (s.data_digest, key_field,
+                    tuple(file_digest(f) for f in exclude_files), tuple(file_digest(f) for f in previous_files),
+                    int(last_events), dedup)
+        if prep_key != s.prep_key:
+            df, s.prep_report = prepare_shared(prep_key, source_df, exclude_files, previous_files)
+            s.prep_key = prep_key
+
+            # Otro anfitrión pudo haber abierto ya el mismo sorteo (o queda en el diario)
+            raffle = registry.open(raffle_digest_for(prep_key), df, s.rng_seed,
+                                   history=get_history(), key_field=key_field)
+            s.raffle_id, s.seen_version = raffle.id, raffle.version
+            if raffle.resumed and raffle.winners:
+                st.toast(f"Se recuperó el sorteo guardado: {len(raffle.winners)} ganadores confirmados.")
+            s.field1, s.field2 = default_fields(df)
+            st.rerun() # Forzar re-ejecución con el sorteo ya abierto
     except Exception as e:
         st.error(f"No se pudo leer el archivo: {e}")
 
-if s.df.empty:
+if s.prep_report and raffle is not None:
+    r = s.prep_report
+    st.success(
+        f"Datos cargados: {r['total']} participantes · {r['duplicates']} duplicados · "
+        f"{r['excluded']} excluidos · {r['previous_winners']} ganadores anteriores · "
+        f"*{r['eligible']} habilitados*."
+    )
+
+if raffle is None:
     st.info("Aún no hay datos. Carga un Excel para continuar.")
     st.stop()
 
+df = raffle.df
 st.divider()
 
 # ----------------------------------
@@ -55,65 +229,130 @@ st.subheader("Configuración")
 c1, c2, c3 = st.columns([1,1,1])
 with c1:
     # Usamos la columna por defecto establecida al cargar
-    default_index_f1 = s.df.columns.tolist().index(s.field1) if s.field1 in s.df.columns else 1 if len(s.df.columns)>1 else 0
-    s.field1 = st.selectbox("Campo 1 (principal)", s.df.columns.tolist(), index=default_index_f1)
+    default_index_f1 = df.columns.tolist().index(s.field1) if s.field1 in df.columns else 1 if len(df.columns)>1 else 0
+    s.field1 = st.selectbox("Campo 1 (principal)", df.columns.tolist(), index=default_index_f1)
 with c2:
     # Usamos la columna por defecto establecida al cargar
-    default_index_f2 = s.df.columns.tolist().index(s.field2) if s.field2 in s.df.columns else 2 if len(s.df.columns)>2 else 0
-    s.field2 = st.selectbox("Campo 2 (detalle)", s.df.columns.tolist(), index=default_index_f2)
+    default_index_f2 = df.columns.tolist().index(s.field2) if s.field2 in df.columns else 2 if len(df.columns)>2 else 0
+    s.field2 = st.selectbox("Campo 2 (detalle)", df.columns.tolist(), index=default_index_f2)
 with c3:
-    s.num_winners = st.number_input("Cantidad de premios", min_value=1, max_value=len(s.df), 
-                                    value=int(s.num_winners), step=1)
+    # Con categorías, la cantidad de premios es la suma de las categorías
+    num_winners = st.number_input("Cantidad de premios", min_value=1, max_value=max(len(df), raffle.num_winners),
+                                  value=int(raffle.num_winners), step=1, disabled=bool(raffle.tiers))
+
+weight_options = ["(ninguna)"] + df.columns.tolist()
+weight_choice = st.selectbox(
+    "Columna de peso (opcional: boletos, puntos...)", weight_options,
+    index=weight_options.index(raffle.weight_field) if raffle.weight_field in weight_options else 0,
+    disabled=started,
+)
+
+q1, q2 = st.columns([2,1])
+quota_options = ["(ninguna)"] + df.columns.tolist()
+quota = raffle.quota
+with q1:
+    # Como las categorías, la cuota queda fija una vez que hay ganadores o un candidato
+    quota_locked = started
+    quota_choice = st.selectbox(
+        "Cuota por grupo (opcional: al menos N ganadores por Ciudad, Area...)", quota_options,
+        index=quota_options.index(quota["field"]) if quota and quota["field"] in quota_options else 0,
+        disabled=quota_locked,
+    )
+with q2:
+    quota_min = st.number_input("Mínimo por grupo", min_value=1, value=int(quota["min"]) if quota else 1, step=1,
+                                disabled=quota_locked or quota_choice == "(ninguna)")
+if quota_choice == "(ninguna)":
+    quota = None
+elif not raffle.tiers:
+    wanted = {"field": quota_choice, "min": int(quota_min)}
+    # Lo que la cuota aún pide (descontando los ganadores ya confirmados) contra los premios que faltan
+    need, slots = raffle.pending_quota(wanted), num_winners - raffle.current_index
+    if need <= slots:
+        quota = wanted
+    elif quota_locked:
+        st.error(f"La cuota todavía pide {need} ganadores: no se puede bajar a {num_winners} premios.")
+        num_winners = raffle.num_winners
+    else:
+        st.error(f"La cuota pide {need} ganadores y hay {slots} premios.")
+
+tiers_text = st.text_area(
+    "Categorías de premios (opcional): una por línea, NOMBRE:CANTIDAD[:COLUMNA=VALOR1|VALOR2]",
+    value=format_tiers(raffle.tiers),
+    placeholder="Mayor:1\nMedio:50:Ciudad=Lima\nMenor:2000:Area=Ventas|Soporte",
+    # Las categorías quedan fijas una vez que hay ganadores o un candidato
+    disabled=started,
+)
+tiers = raffle.tiers
+try:
+    parsed = parse_tiers(tiers_text)
+    missing = sorted({t.field for t in parsed if t.field and t.field not in df.columns})
+    if missing:
+        st.error(f"Columnas inexistentes en las categorías: {', '.join(missing)}")
+    else:
+        tiers = parsed
+except ValueError as e:
+    st.error(str(e))
 
-st.caption(f"Participantes cargados: *{len(s.df)}*")
+# El pool y el flujo aleatorio son del sorteo compartido: solo se rehacen si cambia el peso, las categorías o la semilla
+tiers_changed = tiers != raffle.tiers
+raffle.configure(num_winners, None if weight_choice == "(ninguna)" else weight_choice, s.rng_seed, tiers, quota)
+if tiers_changed and raffle.tiers == tiers:
+    st.rerun() # Mostrar la cantidad de premios de las categorías
+
+st.caption(f"Participantes cargados: *{len(df)}* · Semilla del sorteo: `{raffle.rng.seed}`")
+st.markdown(f"👀 Pantalla para espectadores: [?sorteo={raffle.id}](?sorteo={raffle.id})")
 
 # ----------------------------------
 # ===== 3) Estado del sorteo =====
 # ----------------------------------
 st.subheader("Sorteo")
-st.write(f"Ganadores confirmados: *{s.current_index} / {s.num_winners}*")
+st.write(f"Ganadores confirmados: *{raffle.current_index} / {raffle.num_winners}*")
 
 
-if s.candidate is not None:
+if raffle.candidate is not None:
     # --- MODO: CANDIDATO EN ESPERA DE CONFIRMACIÓN ---
-    cand_data, prize_val = s.candidate # cand_data es el dict completo: {'row':{...}, 'prize':x, 'original_index':y}
-    cand_row = cand_data['row'] 
-    
-    st.success(f"🎯 Candidato para *Premio #{prize_val}*")
-    
+    cand_data = raffle.candidate # Winner: premio, posición e índice original
+    cand_row = raffle.row(cand_data) # La fila se lee recién para mostrarla
+
+    st.success(f"🎯 Candidato para *Premio #{cand_data.prize}*" + (f" ({cand_data.tier})" if cand_data.tier else ""))
+
     # Muestra los campos seleccionados en Configuración
     st.markdown(f"**{s.field1}:** `{cand_row.get(s.field1,'')}`")
     st.markdown(f"**{s.field2}:** `{cand_row.get(s.field2,'')}`")
-    
+
     cA, cB = st.columns(2)
     with cA:
         if st.button("✅ Confirmar ganador"):
-            # Almacenar el diccionario de datos del candidato completo
-            s.winners.append(cand_data) 
-            s.current_index += 1
-            s.candidate = None
-            st.rerun() 
+            raffle.confirm()
+            st.rerun()
     with cB:
         if st.button("🔄 Volver a sortear"):
-            reset_round() # Pone s.candidate = None
-            st.rerun() 
+            raffle.redraw()
+            st.rerun()
 else:
     # --- MODO: LISTO PARA SORTEAR ---
-    if s.current_index >= s.num_winners:
+    if raffle.current_index >= raffle.num_winners:
         st.info("¡Sorteo completo! Revisa la lista de ganadores abajo.")
     else:
-        left = remaining_participants(s.df, s.winners)
-        if left.empty:
+        if not raffle.pool or raffle.next_prize() is None:
             st.warning("No quedan participantes disponibles.")
         else:
-            if st.button("🎲 ¡Sortear siguiente!"): 
-                cand_data, prize_val = pick_candidate(left, s.num_winners, s.current_index, s.rng_seed)
-                if cand_data is None:
-                    st.warning("No se pudo seleccionar un candidato.")
-                else:
-                    # Almacenar el resultado de pick_candidate (datos y valor del premio)
-                    s.candidate = (cand_data, prize_val) 
-                    st.rerun() 
+            cD, cE = st.columns(2)
+            with cD:
+                if st.button("🎲 ¡Sortear siguiente!"):
+                    if raffle.draw() is None:
+                        st.warning("No se pudo seleccionar un candidato.")
+                    else:
+                        st.rerun()
+            with cE:
+                # Modo "resultados instantáneos": todos los premios restantes de una vez, ya confirmados
+                if st.button("⚡ Sortear todos los premios restantes"):
+                    try:
+                        raffle.draw_remaining()
+                    except ValueError as e:
+                        st.error(str(e))
+                    else:
+                        st.rerun()
 
 st.divider()
 
@@ -121,30 +360,7 @@ st.divider()
 # ===== 4) Lista de ganadores y exportación =====
 # ----------------------------------------------------
 st.subheader("Lista de ganadores")
-if not s.winners:
-    st.info("Aún no hay ganadores confirmados.")
-else:
-    winners_sorted = sorted(s.winners, key=lambda x: x["prize"]) 
-    out_rows = []
-    
-    # Reconstruir la tabla de ganadores
-    for w in winners_sorted:
-        out_rows.append({
-            "Premio": f"Premio #{w['prize']}",
-            s.field1: w["row"].get(s.field1, ""),
-            s.field2: w["row"].get(s.field2, ""),
-        })
-    dfw = pd.DataFrame(out_rows)
-    st.dataframe(dfw, use_container_width=True, hide_index=True)
-
-    xls_bytes = export_winners_xlsx(s.winners, s.field1, s.field2)
-    if xls_bytes:
-        st.download_button(
-            "⬇️ Exportar a Excel",
-            data=xls_bytes,
-            file_name="GANADORES.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+show_winners(raffle, s.field1, s.field2)
 
 # ----------------------------------
 # ===== 5) Controles de Limpieza =====
@@ -152,12 +368,22 @@ else:
 st.divider()
 cR1, cR2 = st.columns(2)
 with cR1:
-    if st.button("🔁 Reiniciar sorteo (mantener datos)"):
-        s.winners, s.current_index, s.candidate = [], 0, None
+    # Reinicio explícito del sorteo compartido: afecta a todos los anfitriones y espectadores
+    if st.button("🔁 Reiniciar sorteo para todos (mantener datos)"):
+        raffle.reset()
         st.rerun()
 with cR2:
     if st.button("🧹 Limpiar todo"):
-        # Limpia todas las variables de sesión, incluyendo los datos cargados
+        # Solo desconecta esta sesión: el sorteo compartido sigue para los demás
+        # (y se reanuda si se vuelve a subir el mismo archivo)
         for k in list(st.session_state.keys()):
             del st.session_state[k]
-        st.rerun()
\ No newline at end of file
+        st.rerun()
+
+# ----------------------------------------------------
+# ===== 6) Métricas (solo con SORTEO_METRICS=memory) =====
+# ----------------------------------------------------
+sink = metrics.memory_sink()
+if sink is not None:
+    with st.expander("🛠️ Métricas (depuración)"):
+        st.dataframe(pd.DataFrame(sink.snapshot()), use_container_width=True, hide_index=True)
@@ -0,0 +1,66 @@
+"""
+Benchmark del tiempo de importación del núcleo (sorteo, carga y exportación).
+
+Importa cada módulo en un intérprete nuevo varias veces, informa la mediana y
+falla (código 1) si supera el presupuesto o si arrastra módulos pesados que
+deben cargarse recién al usarse (streamlit, kivy, pandas).
+
+    python benchmarks/bench_import.py [--runs 7] [--budget-ms 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ("sorteo_logic", "sorteo_journal", "sorteo_cli")
+FORBIDDEN = ("streamlit", "kivy", "pandas")
+
+_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, runs: int) -> dict:
+    """Mediana (ms) de `runs` importaciones en frío y módulos prohibidos cargados."""
+    times, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, forbidden=FORBIDDEN)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        result = json.loads(out.stdout)
+        times.append(result["ms"])
+        loaded.update(result["loaded"])
+    return {"module": module, "median_ms": statistics.median(times), "loaded": sorted(loaded)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=200.0,
+                        help="Tiempo máximo (mediana) por módulo, en milisegundos.")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in MODULES:
+        r = measure(module, args.runs)
+        problems = []
+        if r["median_ms"] > args.budget_ms:
+            problems.append(f"supera {args.budget_ms:.0f} ms")
+        if r["loaded"]:
+            problems.append("carga " + ", ".join(r["loaded"]))
+        failed |= bool(problems)
+        status = "FALLA: " + "; ".join(problems) if problems else "ok"
+        print(f"{module:<16} {r['median_ms']:8.1f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Benchmarks de las rutas críticas: carga, sorteo y exportación.
+
+Genera planillas de participantes (generate_dummy_data) de cada tamaño, mide el
+tiempo (mediana de --repeat corridas) y el pico de memoria (tracemalloc, en una
+corrida aparte) de cada caso, y compara contra benchmarks/baseline.json: falla
+(código 1) si algún caso empeora más que --tolerance. Sin interfaz: no carga
+streamlit ni kivy (el caso "kivy_*" mide las funciones que usa RaffleApp).
+
+    python benchmarks/bench_sorteo.py [--sizes 1k,100k,1m] [--prizes 100] [--save-baseline]
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sorteo_logic import (  # noqa: E402
+    RaffleRng, ParticipantStore, Winner, make_pool, remaining_participants, pick_candidate, draw_many,
+    load_excel_3cols, load_participant_store, export_winners_xlsx, export_winners_csv,
+    generate_dummy_data, SNAPSHOT_SUFFIX,
+)
+from sorteo_tiers import PrizeTier, TierDraw, GroupIndex, quota_draw  # noqa: E402
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+DATA_DIR = os.path.join(ROOT, "benchmarks", ".data")
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+SEED = 2024
+# Por debajo de estos valores el ruido (planificador, GC, caché) domina: se compara contra el piso.
+# Los casos de pocos ms solo fallan si pasan de TIME_FLOOR_S * (1 + tolerancia)
+TIME_FLOOR_S = 0.05
+MEMORY_FLOOR_MB = 1.0
+
+# Casos: nombre -> (preparación no medida, función medida). Se registran con @bench.
+BENCHES = {}
+
+
+def bench(name):
+    def register(setup):
+        BENCHES[name] = setup
+        return setup
+    return register
+
+
+def data_file(n: int) -> str:
+    """Planilla XLSX de `n` participantes; se genera una vez y se reutiliza entre corridas."""
+    path = os.path.join(DATA_DIR, f"participantes_{n}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"  generando {os.path.relpath(path, ROOT)}...", file=sys.stderr)
+        df = generate_dummy_data(n, seed=SEED)
+        tmp = path + ".tmp.xlsx"
+        df.to_excel(tmp, index=False, engine="xlsxwriter", engine_kwargs={"options": {"constant_memory": True}})
+        os.replace(tmp, path)
+    return path
+
+
+def drop_snapshot(path: str):
+    if os.path.exists(path + SNAPSHOT_SUFFIX):
+        os.remove(path + SNAPSHOT_SUFFIX)
+
+
+# -------- Carga --------
+@bench("web_load")
+def _web_load(ctx):
+    return lambda: load_excel_3cols(ctx["path"])
+
+
+@bench("kivy_load")
+def _kivy_load(ctx):
+    # Carga completa (sin instantánea): lo que hace RaffleApp.load_data la primera vez
+    def run():
+        drop_snapshot(ctx["path"])
+        return load_participant_store(ctx["path"])
+    return run
+
+
+@bench("kivy_load_snapshot")
+def _kivy_load_snapshot(ctx):
+    load_participant_store(ctx["path"]) # Deja la instantánea escrita
+    return lambda: load_participant_store(ctx["path"])
+
+
+# -------- Sorteo de K premios --------
+@bench("legacy_draw")
+def _legacy_draw(ctx):
+    # Sorteo histórico: remaining_participants (copia del DataFrame) + pick_candidate en cada premio
+    df, k = ctx["df"], ctx["prizes"]
+
+    def run():
+        rng, winners = RaffleRng(SEED), []
+        for i in range(k):
+            cand, _ = pick_candidate(remaining_participants(df, winners), k, i, rng)
+            winners.append(cand)
+        return winners
+    return run
+
+
+@bench("pool_draw")
+def _pool_draw(ctx):
+    # Sorteo actual de la app web: pool O(1) + pick_candidate sobre el DataFrame completo
+    df, k = ctx["df"], ctx["prizes"]
+
+    def run():
+        rng, pool, winners = RaffleRng(SEED), make_pool(len(df)), []
+        for i in range(k):
+            cand, _ = pick_candidate(df, k, i, rng, pool=pool)
+            pool.remove(cand.position)
+            winners.append(cand)
+        return winners
+    return run
+
+
+@bench("draw_many")
+def _draw_many(ctx):
+    df, k = ctx["df"], ctx["prizes"]
+    return lambda: draw_many(df, make_pool(len(df)), k, 0, RaffleRng(SEED))
+
+
+@bench("kivy_draw")
+def _kivy_draw(ctx):
+    # RaffleApp.draw_winner: sortear del pool, quitar, guardar el Winner y materializar la fila a mostrar
+    store, k = ctx["store"], ctx["prizes"]
+
+    def run():
+        rng, pool, winners = RaffleRng(SEED), make_pool(len(store)), []
+        for i in range(k):
+            position = pool.pick(rng)
+            pool.remove(position)
+            winners.append(Winner(k - i, position))
+            store.row(position)
+        return winners
+    return run
+
+
+@bench("tier_draw")
+def _tier_draw(ctx):
+    # Sorteo por categorías: partición por columna y un pool por categoría
+    df, k = ctx["tier_df"], ctx["prizes"]
+    tiers = [PrizeTier("Mayor", 1), PrizeTier("Lima", k, "Ciudad", ["Lima"]),
+             PrizeTier("Quito", k, "Ciudad", ["Quito"]), PrizeTier("Ventas", 10 * k, "Area", ["Ventas"])]
+    return lambda: TierDraw(df, tiers).draw_all(RaffleRng(SEED))
+
+
+@bench("quota_draw")
+def _quota_draw(ctx):
+    # Sorteo con cuota por Ciudad: grupos precalculados (no medidos, como al cargar) y una pasada
+    df, k = ctx["tier_df"], ctx["prizes"]
+    groups = GroupIndex(df, "Ciudad")
+    quota = k // (2 * len(groups))
+    return lambda: quota_draw(make_pool(len(df)), groups, quota, k, RaffleRng(SEED))
+
+
+# -------- Exportación --------
+@bench("export_xlsx")
+def _export_xlsx(ctx):
+    winners = draw_many(ctx["df"], make_pool(len(ctx["df"])), ctx["prizes"], 0, RaffleRng(SEED))
+    f1, f2 = ctx["df"].columns[1], ctx["df"].columns[2]
+    return lambda: export_winners_xlsx(ctx["df"], winners, f1, f2)
+
+
+@bench("export_csv")
+def _export_csv(ctx):
+    winners = draw_many(ctx["df"], make_pool(len(ctx["df"])), ctx["prizes"], 0, RaffleRng(SEED))
+    f1, f2 = ctx["df"].columns[1], ctx["df"].columns[2]
+    return lambda: export_winners_csv(ctx["df"], winners, f1, f2)
+
+
+def measure(run, repeat: int) -> dict:
+    """Mediana de `repeat` corridas (s) y pico de memoria (MB) de una corrida con tracemalloc."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"s": statistics.median(times), "peak_mb": peak / 2**20}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Casos que empeoraron más que `tolerance` (proporción) respecto de la línea base."""
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, floor in (("s", TIME_FLOOR_S), ("peak_mb", MEMORY_FLOOR_MB)):
+            limit = max(base[metric], floor) * (1 + tolerance)
+            if r[metric] > limit:
+                regressions.append(f"{key} {metric}: {r[metric]:.3f} > {limit:.3f} (base {base[metric]:.3f})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1k,100k,1m", help=f"Tamaños a medir ({', '.join(SIZES)}).")
+    parser.add_argument("--prizes", type=int, default=100, help="Premios por sorteo (K).")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="Casos a medir, separados por coma (por defecto todos).")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Empeoramiento admitido respecto de la línea base (0.5 = +50%%).")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda los resultados como línea base.")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHES)
+    results = {}
+    for label in args.sizes.split(","):
+        n = SIZES[label]
+        path = data_file(n)
+        # tier_draw y quota_draw usan además las columnas de las categorías; el resto, solo las 3 primeras
+        tier_df = load_excel_3cols(path, extra=("Ciudad", "Area"))
+        df = tier_df.iloc[:, :3].copy()
+        ctx = {"path": path, "df": df, "tier_df": tier_df, "store": ParticipantStore(df),
+               "prizes": min(args.prizes, n)}
+        for name in names:
+            r = measure(BENCHES[name](ctx), args.repeat)
+            key = f"{name}[{label}]"
+            results[key] = r
+            print(f"{key:<28} {r['s'] * 1000:10.1f} ms  {r['peak_mb']:8.1f} MB")
+        drop_snapshot(path)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as fh:
+                baseline = json.load(fh)
+        baseline.update({k: {m: round(v, 6) for m, v in r.items()} for k, r in results.items()})
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(dict(sorted(baseline.items())), fh, indent=2)
+            fh.write("\n")
+        print(f"Línea base guardada en {os.path.relpath(args.baseline, ROOT)}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Sin línea base para comparar (usar --save-baseline).")
+        return 0
+    with open(args.baseline, encoding="utf-8") as fh:
+        regressions = compare(results, json.load(fh), args.tolerance)
+    for line in regressions:
+        print(f"FALLA: {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Sorteo por línea de comandos, sin interfaz (para cron / lotes).
+
+Usa solo las funciones puras de sorteo_logic: no carga streamlit ni kivy.
+
+    python sorteo_cli.py PARTICIPANTES.xlsx --premios 10 --semilla 42 --salida GANADORES.xlsx
+    python sorteo_cli.py sedes/ --premios 10 # Todas las planillas de la carpeta, unidas
+"""
+import argparse
+import os
+import sys
+import time
+
+from sorteo_logic import (
+    RaffleRng, Winner, make_pool, column_weights, draw_many, winner_values,
+    load_excel_3cols, expand_sources, export_winners_xlsx, export_winners_csv,
+    read_keys, prepare_participants,
+)
+from sorteo_journal import RaffleJournal, winner_record
+from sorteo_history import HISTORY_PATH
+import sorteo_metrics as metrics
+from sorteo_tiers import PrizeTier, TierDraw, GroupIndex, parse_quota, quota_draw
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Sorteo Digital Mettatec sin interfaz.")
+    parser.add_argument("entrada", nargs="+",
+                        help="Archivo de participantes (XLSX, CSV, Parquet o Feather), carpeta o patrón "
+                             "('sedes/*.xlsx'); varios archivos se unen (mismas columnas) en procesos paralelos.")
+    parser.add_argument("-n", "--premios", type=int, help="Cantidad de premios a sortear (sin --categoria).")
+    parser.add_argument("-s", "--semilla", type=int, default=None,
+                        help="Semilla para un sorteo reproducible (por defecto, aleatoria).")
+    parser.add_argument("-o", "--salida", default="GANADORES.xlsx",
+                        help="Archivo de ganadores (.xlsx o .csv). Por defecto GANADORES.xlsx.")
+    parser.add_argument("--campo1", help="Columna principal a exportar (por defecto la 2da).")
+    parser.add_argument("--campo2", help="Columna de detalle a exportar (por defecto la 3ra).")
+    parser.add_argument("--peso", help="Columna con el peso de cada participante (boletos, puntos...).")
+    parser.add_argument("--diario", help="Ruta de un diario JSON-lines donde registrar el sorteo.")
+    parser.add_argument("--clave", help="Columna que identifica a cada persona, para cruzar las listas "
+                                        "(por defecto la 1ra).")
+    parser.add_argument("--sin-duplicados", action="store_true",
+                        help="Una participación por persona: quita las filas con la clave repetida.")
+    parser.add_argument("--excluir", action="append", default=[], metavar="ARCHIVO",
+                        help="Lista de personas excluidas (se puede repetir).")
+    parser.add_argument("--anteriores", action="append", default=[], metavar="ARCHIVO",
+                        help="Ganadores de sorteos anteriores, que no participan (se puede repetir).")
+    parser.add_argument("--historial", nargs="?", const=HISTORY_PATH, metavar="ARCHIVO",
+                        help=f"Historial de ganadores (SQLite) donde registrar este sorteo "
+                             f"(por defecto {HISTORY_PATH}).")
+    parser.add_argument("--ultimos", type=int, default=0, metavar="N",
+                        help="Excluir a quienes ganaron en los últimos N sorteos del historial.")
+    parser.add_argument("--categoria", action="append", default=[], type=PrizeTier.parse,
+                        metavar="NOMBRE:CANTIDAD[:COLUMNA=VALOR1|VALOR2]",
+                        help="Categoría de premios (se puede repetir; los premios se numeran en ese orden). "
+                             "Reemplaza a --premios.")
+    parser.add_argument("--cuota", type=parse_quota, metavar="COLUMNA=MINIMO",
+                        help="Al menos MINIMO ganadores por cada valor de COLUMNA (Ciudad=2). "
+                             "No se combina con --categoria.")
+    parser.add_argument("--metricas", metavar="DESTINOS",
+                        help=f"Destinos de métricas, p. ej. log:metricas.jsonl,prom:sorteo.prom "
+                             f"(por defecto la variable {metrics.ENV_VAR}).")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.categoria:
+        args.premios = sum(t.count for t in args.categoria)
+    elif args.premios is None or args.premios < 1:
+        print("Error: --premios debe ser al menos 1 (o indicar --categoria).", file=sys.stderr)
+        return 2
+    if args.cuota and args.categoria:
+        print("Error: --cuota no se combina con --categoria.", file=sys.stderr)
+        return 2
+    if args.metricas is not None:
+        try:
+            metrics.configure(args.metricas)
+        except (ValueError, OSError) as e:
+            print(f"Error: --metricas: {e}", file=sys.stderr)
+            return 2
+
+    entrada = " ".join(args.entrada)
+    # Las listas de exclusión pueden estar en la misma carpeta que las planillas
+    sources = expand_sources(args.entrada, skip=[os.path.basename(p) for p in args.excluir + args.anteriores])
+    if not sources:
+        print(f"Error: no se encontraron archivos de participantes en {entrada}", file=sys.stderr)
+        return 1
+    try:
+        # Además de las 3 primeras, solo las columnas que se piden por nombre
+        extra = [f for f in (args.campo1, args.campo2, args.clave, args.peso,
+                             *(t.field for t in args.categoria), args.cuota and args.cuota[0]) if f]
+        with metrics.timed("load", app="cli"):
+            df = load_excel_3cols(sources[0] if len(sources) == 1 else sources, extra=extra)
+    except Exception as e:
+        print(f"Error: no se pudo leer {entrada}: {e}", file=sys.stderr)
+        return 1
+
+    columns = df.columns.tolist()
+    field1 = args.campo1 or columns[1]
+    field2 = args.campo2 or columns[2]
+    key = args.clave or columns[0]
+    for field in (field1, field2, args.peso, key, *(t.field for t in args.categoria), args.cuota and args.cuota[0]):
+        if field is not None and field not in columns:
+            print(f"Error: la columna '{field}' no existe. Columnas: {', '.join(columns)}", file=sys.stderr)
+            return 2
+
+    history = None
+    if args.historial or args.ultimos:
+        from sorteo_history import WinnersHistory
+        history = WinnersHistory(args.historial or HISTORY_PATH)
+
+    try:
+        with metrics.timed("eligibility", app="cli"):
+            previous = [read_keys(path, key) for path in args.anteriores]
+            if args.ultimos:
+                previous.append(history.won(df[key], args.ultimos))
+            df, report = prepare_participants(
+                df, key,
+                exclude=[read_keys(path, key) for path in args.excluir],
+                previous_winners=previous,
+                dedup=args.sin_duplicados,
+            )
+    except Exception as e:
+        print(f"Error: no se pudo leer una lista de exclusión: {e}", file=sys.stderr)
+        return 1
+
+    rng = RaffleRng(args.semilla)
+    weights = column_weights(df, args.peso) if args.peso else None
+    if args.categoria:
+        # Una partición y un pool por categoría; se sortean una tras otra
+        winners = TierDraw(df, args.categoria, weights).draw_all(rng)
+    elif args.cuota:
+        # Grupos calculados una vez; la cuota de cada grupo y el resto, en una pasada
+        quota_field, quota_min = args.cuota
+        try:
+            positions = quota_draw(make_pool(len(df), weights), GroupIndex(df, quota_field), quota_min,
+                                   args.premios, rng)
+        except ValueError as e:
+            print(f"Error: --cuota: {e}", file=sys.stderr)
+            return 2
+        winners = [Winner(i + 1, pos, df.index[pos]) for i, pos in enumerate(positions)]
+    else:
+        winners = draw_many(df, make_pool(len(df), weights), args.premios, 0, rng)
+    if not winners:
+        print("Error: no hay participantes disponibles para sortear.", file=sys.stderr)
+        return 1
+
+    if args.diario:
+        journal = RaffleJournal(args.diario)
+        journal.append("start", rng={"seed": rng.seed, "draws": 0}, n=len(df),
+                       num_winners=args.premios, weight_field=args.peso,
+                       tiers=[t.to_dict() for t in args.categoria],
+                       quota=args.cuota and {"field": args.cuota[0], "min": args.cuota[1]})
+        journal.append("draw_many", rng=rng.to_dict(), winners=[winner_record(w) for w in winners])
+        journal.close()
+
+    if history is not None:
+        # Cada ejecución es un evento propio del historial
+        keys = winner_values(df, winners, [key])
+        history.add(f"cli:{rng.seed}:{time.time_ns()}", [(k, w.prize) for (k,), w in zip(keys, winners)],
+                    label=entrada)
+        history.close()
+
+    export = export_winners_csv if args.salida.lower().endswith(".csv") else export_winners_xlsx
+    with open(args.salida, "wb") as fh:
+        fh.write(export(df, winners, field1, field2))
+
+    print(f"Participantes: {report['total']} · Duplicados: {report['duplicates']} · "
+          f"Excluidos: {report['excluded']} · Ganadores anteriores: {report['previous_winners']} · "
+          f"Habilitados: {report['eligible']} · Semilla: {rng.seed}")
+    for w, (v1, v2) in zip(winners, winner_values(df, winners, [field1, field2])):
+        tier = f" [{w.tier}]" if w.tier else ""
+        print(f"Premio #{w.prize}{tier}: {v1} ({v2})")
+    if len(winners) < args.premios:
+        print(f"Aviso: solo había {len(winners)} participantes disponibles.", file=sys.stderr)
+    print(f"Ganadores guardados en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
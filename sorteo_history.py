@@ -0,0 +1,105 @@
+"""
+Historial de ganadores entre sorteos (SQLite).
+
+Cada sorteo es un evento y sus ganadores se guardan por clave normalizada
+(ID, correo...; ver sorteo_logic.normalize_keys). Para excluir a quienes ya
+ganaron en los últimos N eventos, las claves de los participantes se pasan en
+un solo parámetro JSON y se cruzan con el índice (key, event_id): solo vuelven
+a Python las claves que coinciden, aunque el historial tenga millones de filas.
+"""
+import sqlite3
+import threading
+import time
+
+import sorteo_metrics as metrics
+
+# Historial compartido por la app web, la de escritorio y la línea de comandos
+HISTORY_PATH = "sorteo_historial.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    label TEXT,
+    ts REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS winners (
+    event_id INTEGER NOT NULL REFERENCES events(id),
+    key TEXT NOT NULL,
+    prize INTEGER
+);
+CREATE INDEX IF NOT EXISTS winners_key ON winners (key, event_id);
+CREATE INDEX IF NOT EXISTS winners_event ON winners (event_id);
+"""
+
+
+class WinnersHistory:
+    """Historial persistente; se puede usar desde varios hilos (una conexión con lock)."""
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def _event_id(self, event_key: str, label: str | None = None) -> int:
+        row = self._db.execute("SELECT id FROM events WHERE key = ?", (event_key,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self._db.execute("INSERT INTO events (key, label, ts) VALUES (?, ?, ?)",
+                                (event_key, label, time.time())).lastrowid
+
+    def add(self, event_key: str, winners: list, label: str | None = None):
+        """Registra ganadores [(valor de la clave, premio), ...] en el evento (se crea si no existe)."""
+        from sorteo_logic import normalize_keys
+        keys = normalize_keys([value for value, _ in winners]).tolist()
+        rows = [(key, prize) for key, (_, prize) in zip(keys, winners) if key]
+        with self._lock, self._db:
+            event_id = self._event_id(event_key, label)
+            self._db.executemany("INSERT INTO winners (event_id, key, prize) VALUES (?, ?, ?)",
+                                 [(event_id, key, prize) for key, prize in rows])
+
+    def clear(self, event_key: str):
+        """Borra los ganadores de un evento (sorteo reiniciado)."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM winners WHERE event_id IN (SELECT id FROM events WHERE key = ?)",
+                             (event_key,))
+
+    def won(self, keys, last_events: int | None = None, exclude_event: str | None = None) -> list:
+        """
+        Claves normalizadas de `keys` que ganaron en los últimos `last_events`
+        eventos (None = en cualquiera), sin contar el evento `exclude_event` ni
+        sus vueltas ("<exclude_event>:<n>", un sorteo repetido tras reiniciarlo).
+        """
+        import json
+        from sorteo_logic import normalize_keys
+        candidates = json.dumps(normalize_keys(keys).unique().tolist(), ensure_ascii=False)
+        with self._lock, metrics.timed("history_lookup"):
+            excluded = json.dumps([id_ for id_, in self._db.execute(
+                "SELECT id FROM events WHERE key = ? OR substr(key, 1, length(?) + 1) = ? || ':'",
+                (exclude_event, exclude_event, exclude_event),
+            )])
+            # Los últimos N eventos (sin los excluidos) son los de id >= el N-ésimo más reciente
+            first = self._db.execute(
+                "SELECT MIN(id) FROM (SELECT id FROM events WHERE id NOT IN (SELECT value FROM json_each(?)) "
+                "ORDER BY id DESC LIMIT ?)",
+                (excluded, -1 if last_events is None else int(last_events)),
+            ).fetchone()[0]
+            if first is None:
+                return []
+            # Las claves viajan en un solo parámetro JSON; una búsqueda en el índice (key, event_id) por clave
+            rows = self._db.execute(
+                "SELECT c.value FROM json_each(?) c WHERE c.value != '' AND EXISTS ("
+                "SELECT 1 FROM winners w WHERE w.key = c.value AND w.event_id >= ? "
+                "AND w.event_id NOT IN (SELECT value FROM json_each(?)))",
+                (candidates, first, excluded),
+            ).fetchall()
+        return [key for key, in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM winners").fetchone()[0]
+
+    def close(self):
+        self._db.close()
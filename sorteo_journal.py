@@ -0,0 +1,116 @@
+"""
+Diario (journal) del sorteo en formato JSON-lines.
+
+Cada evento (inicio, sorteo, confirmación, nuevo sorteo, reinicio) se agrega
+al final del archivo con un costo constante, junto con el estado del flujo
+aleatorio (RaffleRng) y el índice original de la fila. Si el navegador se
+refresca o la aplicación se cierra a mitad del evento, `replay` reconstruye
+el estado leyendo el archivo una sola vez.
+"""
+import json
+import os
+import time
+
+# Carpeta donde la app web guarda un diario por planilla (clave = hash del contenido)
+JOURNAL_DIR = "sorteos"
+# Configuración que puede viajar en cualquier evento; replay conserva el último valor
+CONFIG_KEYS = ("num_winners", "weight_field", "tiers", "quota", "seed", "history_event")
+
+
+def _json_default(value):
+    # Escalares de numpy/pandas (p. ej. el índice original de la fila)
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"No serializable: {type(value).__name__}")
+
+
+def journal_path(digest: str, directory: str = JOURNAL_DIR) -> str:
+    """Ruta del diario asociado a una planilla (por hash de su contenido)."""
+    return os.path.join(directory, f"{digest}.jsonl")
+
+
+def winner_record(winner) -> dict:
+    """Campos de un ganador/candidato (sorteo_logic.Winner o evento del diario) que se guardan en el diario."""
+    if isinstance(winner, dict):
+        record = {
+            "prize": winner["prize"],
+            "position": winner.get("position", winner.get("index")),
+            "original_index": winner.get("original_index"),
+        }
+        tier = winner.get("tier")
+    else:
+        record = {"prize": winner.prize, "position": winner.position, "original_index": winner.original_index}
+        tier = winner.tier
+    if tier is not None:
+        record["tier"] = tier
+    return record
+
+
+class RaffleJournal:
+    """Diario de solo-agregar: una línea JSON por evento, con flush (y fsync) inmediato."""
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def append(self, event: str, **data):
+        """Agrega un evento al final del diario."""
+        record = {"event": event, "ts": time.time(), **data}
+        self._fh.write(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n")
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+
+    def close(self):
+        self._fh.close()
+
+
+def read_events(path: str) -> list:
+    """Lee los eventos del diario; ignora una última línea cortada por un cierre abrupto."""
+    if not os.path.exists(path):
+        return []
+    events = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return events
+
+
+def replay(events: list) -> dict:
+    """
+    Reconstruye el estado del sorteo a partir de los eventos:
+    {"start": evento de inicio, "winners": [...], "candidate": {...} | None,
+     "rng": {"seed", "draws"} | None, "finished": bool, más las claves de CONFIG_KEYS}.
+    "finished" indica un evento "finish": sorteo terminado con premios sin ganador
+    (categorías agotadas o menos habilitados que premios).
+    """
+    state = {"start": None, "winners": [], "candidate": None, "rng": None, "finished": False}
+    state.update(dict.fromkeys(CONFIG_KEYS))
+    for e in events:
+        kind = e["event"]
+        if kind in ("start", "reset"):
+            if kind == "start":
+                state["start"] = e
+            state["winners"], state["candidate"], state["finished"] = [], None, False
+        elif kind == "finish":
+            state["finished"] = True
+        elif kind == "draw":
+            state["candidate"] = winner_record(e)
+        elif kind == "confirm":
+            state["winners"].append(winner_record(e))
+            state["candidate"] = None
+        elif kind == "redraw":
+            state["candidate"] = None
+        elif kind == "draw_many":
+            state["winners"].extend(winner_record(w) for w in e["winners"])
+        for key in ("rng",) + CONFIG_KEYS:
+            if key in e:
+                state[key] = e[key]
+    return state
@@ -1,28 +1,512 @@
-import pandas as pd
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+import csv
+import hashlib
 import io
+import os
 import random
-import streamlit as st # solo para usar session_state; no pinta UI
+
+import sorteo_metrics as metrics
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # -------- Estado (en st.session_state) --------
+# streamlit (y pandas) se importan recién al usarse: las utilidades puras de
+# sorteo, carga y exportación se pueden importar sin ellos.
 def init_state():
-    """Inicializa todas las variables de la sesión si no existen."""
+    """
+    Inicializa las variables de la sesión si no existen. El sorteo en sí (datos,
+    pool, ganadores) vive en sorteo_registry y lo comparten todas las sesiones.
+    """
+    import streamlit as st
     s = st.session_state
-    s.setdefault("df", pd.DataFrame())
     s.setdefault("field1", "")
     s.setdefault("field2", "")
-    s.setdefault("num_winners", 3) 
-    # Lista de dicts: {"prize": n, "row": {...}, "original_index": int}
-    s.setdefault("winners", [])
-    s.setdefault("current_index", 0) 
-    s.setdefault("candidate", None) 
     s.setdefault("rng_seed", None)
     s.setdefault("last_uploaded_file", None)
-
-def reset_round():
-    """Limpia el candidato actual para permitir un nuevo sorteo."""
-    st.session_state.candidate = None
+    s.setdefault("data_digest", None)
+    # Depuración aplicada (planilla, columna clave, listas) y sus conteos
+    s.setdefault("prep_key", None)
+    s.setdefault("prep_report", None)
+    # Sorteo compartido al que está conectada la sesión (anfitrión)
+    s.setdefault("raffle_id", None)
+    # Última versión del sorteo vista por la sesión (espectadores: solo reciben lo nuevo;
+    # None = todavía no vio ninguna, empieza en la actual sin repetir los avisos pasados)
+    s.setdefault("seen_version", None)
 
 # -------- Utilidades puras --------
+class RemainingPool:
+    """
+    Conjunto de posiciones de fila (0..n-1) que aún pueden salir sorteadas.
+
+    Se construye una sola vez al iniciar el sorteo. Elegir al azar, quitar y
+    volver a insertar una posición cuesta O(1): las posiciones disponibles
+    ocupan el prefijo `_items[:_size]` y `_slot` guarda dónde está cada una.
+    """
+    __slots__ = ("_items", "_slot", "_size")
+
+    def __init__(self, n: int, eligible=None):
+        if eligible is None:
+            self._items = np.arange(n, dtype=np.int64)
+            self._slot = np.arange(n, dtype=np.int64)
+            self._size = n
+        else:
+            # Solo las posiciones habilitadas quedan en el prefijo disponible
+            eligible = np.asarray(eligible, dtype=bool)
+            self._items = np.concatenate((np.flatnonzero(eligible), np.flatnonzero(~eligible)))
+            self._slot = np.empty(n, dtype=np.int64)
+            self._slot[self._items] = np.arange(n, dtype=np.int64)
+            self._size = int(eligible.sum())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, pos: int) -> bool:
+        return 0 <= pos < len(self._slot) and self._slot[pos] < self._size
+
+    def _swap(self, i: int, j: int):
+        a, b = self._items[i], self._items[j]
+        self._items[i], self._items[j] = b, a
+        self._slot[a], self._slot[b] = j, i
+
+    def pick(self, rng=random) -> int:
+        """Devuelve una posición disponible al azar (sin quitarla)."""
+        if self._size == 0:
+            raise IndexError("No quedan participantes disponibles.")
+        return int(self._items[rng.randrange(self._size)])
+
+    def remove(self, pos: int):
+        """Quita la posición del pool (ganador sorteado/confirmado)."""
+        if pos in self:
+            self._swap(int(self._slot[pos]), self._size - 1)
+            self._size -= 1
+
+    def take(self, k: int, rng=random) -> list:
+        """
+        Sortea y quita `k` posiciones distintas de una vez (Fisher-Yates parcial:
+        cada elegida se intercambia al final del prefijo disponible).
+        Devuelve las posiciones en orden de sorteo.
+        """
+        k = min(k, self._size)
+        for _ in range(k):
+            self._swap(rng.randrange(self._size), self._size - 1)
+            self._size -= 1
+        return self._items[self._size:self._size + k][::-1].tolist()
+
+    def restrict(self, positions) -> tuple:
+        """
+        (posiciones de `positions` aún disponibles, RemainingPool nuevo sobre
+        ellas en posiciones locales 0..m-1), vectorizado: para sortear dentro de un grupo.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        available = positions[self._slot[positions] < self._size]
+        return available, RemainingPool(len(available))
+
+    def add(self, pos: int):
+        """Devuelve la posición al pool (ganador descartado)."""
+        if not 0 <= pos < len(self._slot):
+            raise IndexError(pos)
+        if pos not in self:
+            self._swap(int(self._slot[pos]), self._size)
+            self._size += 1
+
+class WeightedPool:
+    """
+    Pool con pesos (boletos comprados, puntos, ...) sobre un árbol de Fenwick.
+
+    Misma interfaz que RemainingPool: sortear, quitar y reinsertar cuestan
+    O(log n), sin recalcular sumas acumuladas en cada sorteo. Las filas con
+    peso <= 0 (o no numérico) no participan.
+    """
+    __slots__ = ("_weights", "_active", "_tree", "_size", "_top")
+
+    def __init__(self, weights):
+        w = np.asarray(weights, dtype=np.float64)
+        w = np.where(np.isfinite(w) & (w > 0), w, 0.0)
+        n = len(w)
+        self._weights = w
+        self._active = w > 0
+        self._size = int(self._active.sum())
+        # Construcción vectorizada O(n): tree[i] = suma de w en (i - lowbit(i), i]
+        csum = np.concatenate(([0.0], np.cumsum(w)))
+        idx = np.arange(1, n + 1)
+        self._tree = np.zeros(n + 1)
+        self._tree[1:] = csum[idx] - csum[idx - (idx & -idx)]
+        self._top = 1 << (n.bit_length() - 1) if n else 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, pos: int) -> bool:
+        return 0 <= pos < len(self._weights) and bool(self._active[pos])
+
+    def _update(self, pos: int, delta: float):
+        tree, n, i = self._tree, len(self._weights), pos + 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def total(self) -> float:
+        """Suma de pesos de las filas disponibles."""
+        tree, i, acc = self._tree, len(self._weights), 0.0
+        while i > 0:
+            acc += tree[i]
+            i -= i & -i
+        return acc
+
+    def pick(self, rng=random) -> int:
+        """Devuelve una posición disponible con probabilidad proporcional a su peso."""
+        if self._size == 0:
+            raise IndexError("No quedan participantes disponibles.")
+        target = rng.random() * self.total()
+        tree, n, pos, step = self._tree, len(self._weights), 0, self._top
+        # Descenso binario: mayor prefijo cuya suma es <= target
+        while step:
+            nxt = pos + step
+            if nxt <= n and tree[nxt] <= target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        pos = min(pos, n - 1)
+        if not self._active[pos]:
+            # Redondeo de punto flotante en un borde: la disponible más cercana
+            active = np.flatnonzero(self._active)
+            pos = int(active[min(np.searchsorted(active, pos), len(active) - 1)])
+        return pos
+
+    def restrict(self, positions) -> tuple:
+        """Como RemainingPool.restrict: WeightedPool local con los pesos de las disponibles."""
+        positions = np.asarray(positions, dtype=np.int64)
+        available = positions[self._active[positions]]
+        return available, WeightedPool(self._weights[available])
+
+    def remove(self, pos: int):
+        if pos in self:
+            self._update(pos, -self._weights[pos])
+            self._active[pos] = False
+            self._size -= 1
+
+    def add(self, pos: int):
+        if not 0 <= pos < len(self._weights):
+            raise IndexError(pos)
+        if not self._active[pos] and self._weights[pos] > 0:
+            self._update(pos, self._weights[pos])
+            self._active[pos] = True
+            self._size += 1
+
+    def take(self, k: int, rng=random) -> list:
+        """Sortea y quita `k` posiciones distintas (sin reemplazo), O(k log n)."""
+        positions = []
+        for _ in range(min(k, self._size)):
+            pos = self.pick(rng)
+            self.remove(pos)
+            positions.append(pos)
+        return positions
+
+
+def column_weights(df: pd.DataFrame, field: str) -> np.ndarray:
+    """Pesos numéricos de una columna (valores no numéricos cuentan como 0)."""
+    import pandas as pd
+    return pd.to_numeric(df[field], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+
+def make_pool(n: int, weights=None, eligible=None):
+    """
+    RemainingPool (mismas chances) o WeightedPool si se indican pesos. `eligible`
+    (máscara booleana, ver eligibility_mask) deja afuera a los no habilitados.
+    """
+    if weights is None:
+        return RemainingPool(n, eligible)
+    if eligible is not None:
+        weights = np.where(eligible, weights, 0.0)
+    return WeightedPool(weights)
+
+
+class RaffleRng:
+    """
+    Flujo aleatorio persistente de un sorteo (PCG64 de numpy).
+
+    Cada sorteo consume exactamente una salida de 64 bits, así que el estado
+    completo es (seed, draws): se serializa con to_dict() y jump_to(n) salta
+    al sorteo n en O(log n) sin repetir los anteriores. Sin semilla se toma
+    entropía del sistema y se guarda en `seed` para poder auditar el sorteo.
+    """
+    __slots__ = ("seed", "draws", "_bitgen")
+
+    def __init__(self, seed: int | None = None, draws: int = 0):
+        self.seed = int(np.random.SeedSequence().entropy if seed is None else seed)
+        self.jump_to(draws)
+
+    def jump_to(self, draws: int):
+        """Posiciona el flujo justo después de `draws` sorteos."""
+        self._bitgen = np.random.PCG64(self.seed)
+        self._bitgen.advance(draws)
+        self.draws = draws
+
+    def _next(self) -> int:
+        self.draws += 1
+        return int(self._bitgen.random_raw())
+
+    def randrange(self, n: int) -> int:
+        """Entero uniforme en [0, n) (sesgo <= n / 2**64, despreciable)."""
+        if n <= 0:
+            raise ValueError("randrange() con rango vacío")
+        return (self._next() * n) >> 64
+
+    def random(self) -> float:
+        """Flotante uniforme en [0, 1)."""
+        return (self._next() >> 11) * (1.0 / (1 << 53))
+
+    def to_dict(self) -> dict:
+        return {"seed": self.seed, "draws": self.draws}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "RaffleRng":
+        return cls(state["seed"], state["draws"])
+
+
+class _PackedStrings:
+    """Columna de texto en un único buffer UTF-8 + offsets (sin un str por fila)."""
+    __slots__ = ("data", "offsets")
+
+    def __init__(self, values):
+        encoded = [str(v).encode("utf-8") for v in values]
+        self.data = b"".join(encoded)
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)),
+                  out=self.offsets[1:])
+
+    @classmethod
+    def from_buffers(cls, data, offsets: np.ndarray) -> "_PackedStrings":
+        """Envuelve buffers ya armados (p. ej. de una instantánea mapeada en memoria) sin copiarlos."""
+        col = cls.__new__(cls)
+        col.data, col.offsets = data, offsets
+        return col
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.nbytes
+
+
+class _CategoricalColumn:
+    """Columna de pocos valores distintos: códigos enteros + categorías."""
+    __slots__ = ("codes", "categories")
+
+    def __init__(self, codes: np.ndarray, categories: list):
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, i: int):
+        return self.categories[self.codes[i]]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(len(str(c)) for c in self.categories)
+
+
+class _NumericColumn:
+    """Columna numérica guardada como array de numpy."""
+    __slots__ = ("values",)
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, i: int):
+        return self.values[i].item()
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+
+def _compact_column(col: pd.Series):
+    """Elige la representación más compacta para una columna del DataFrame."""
+    import pandas as pd
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        return _NumericColumn(col.to_numpy())
+    # Texto (o mixto): los vacíos se guardan como cadena vacía
+    values = col.astype(object).where(col.notna(), "")
+    codes, uniques = pd.factorize(values)
+    if len(uniques) <= len(values) // 2:
+        dtype = np.min_scalar_type(max(len(uniques) - 1, 0))
+        return _CategoricalColumn(codes.astype(dtype), [str(u) for u in uniques])
+    return _PackedStrings(values.to_numpy())
+
+
+class ParticipantStore:
+    """
+    Almacén columnar de participantes.
+
+    Cada columna se guarda de forma compacta (texto empaquetado, códigos de
+    categoría o array numérico) en lugar de un dict por fila, de modo que un
+    millón de filas ocupa decenas de MB. Las filas se materializan como dict
+    solo cuando se piden (p. ej. el ganador sorteado).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.headers = [str(c) for c in df.columns]
+        self._columns = {h: _compact_column(df[c]) for h, c in zip(self.headers, df.columns)}
+        self._n = len(df)
+
+    @classmethod
+    def from_records(cls, headers: list, records: list) -> "ParticipantStore":
+        """Construye el almacén a partir de una lista de dicts (datos dummy)."""
+        import pandas as pd
+        return cls(pd.DataFrame.from_records(records, columns=headers))
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria aproximada ocupada por las columnas."""
+        return sum(c.nbytes for c in self._columns.values())
+
+    def column(self, field: str):
+        """Devuelve la columna (indexable por posición) o None si no existe."""
+        return self._columns.get(field)
+
+    def value(self, pos: int, field: str, default="N/A"):
+        """Valor de un campo para la fila en la posición `pos`."""
+        col = self._columns.get(field)
+        return default if col is None else col[pos]
+
+    def weights(self, field: str) -> np.ndarray:
+        """Pesos numéricos de una columna (valores no numéricos cuentan como 0)."""
+        import pandas as pd
+        col = self._columns[field]
+        if isinstance(col, _NumericColumn):
+            values = col.values
+        elif isinstance(col, _CategoricalColumn):
+            values = pd.to_numeric(pd.Series(col.categories), errors="coerce").to_numpy()[col.codes]
+        else:
+            values = pd.to_numeric(pd.Series([col[i] for i in range(len(col))]), errors="coerce")
+        return np.nan_to_num(np.asarray(values, dtype=np.float64))
+
+    def row(self, pos: int) -> dict:
+        """Materializa la fila en la posición `pos` como dict."""
+        return {h: col[pos] for h, col in self._columns.items()}
+
+    def series(self, field: str) -> pd.Series:
+        """Columna completa como Series de pandas (para operaciones vectorizadas)."""
+        import pandas as pd
+        col = self._columns[field]
+        if isinstance(col, _NumericColumn):
+            return pd.Series(col.values)
+        if isinstance(col, _CategoricalColumn):
+            return pd.Series(pd.Categorical.from_codes(col.codes, col.categories))
+        try:
+            import pyarrow as pa
+        except ImportError:
+            return pd.Series([col[i] for i in range(len(col))], dtype=object)
+        return pa.LargeStringArray.from_buffers(
+            len(col), pa.py_buffer(col.offsets), pa.py_buffer(col.data)).to_pandas()
+
+    def to_arrow(self):
+        """
+        Tabla Arrow con los mismos buffers de las columnas: texto como large_string
+        (mismo formato data + offsets), categorías como diccionario y números tal cual.
+        """
+        import pyarrow as pa
+        arrays = []
+        for col in self._columns.values():
+            if isinstance(col, _PackedStrings):
+                arrays.append(pa.LargeStringArray.from_buffers(
+                    len(col), pa.py_buffer(col.offsets), pa.py_buffer(col.data)))
+            elif isinstance(col, _CategoricalColumn):
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(col.codes), pa.array(col.categories, type=pa.string())))
+            else:
+                arrays.append(pa.array(col.values))
+        return pa.Table.from_arrays(arrays, names=self.headers)
+
+    @classmethod
+    def from_arrow(cls, table) -> "ParticipantStore":
+        """
+        Construye el almacén sobre los buffers de una tabla Arrow sin copiarlos (con
+        una instantánea mapeada en memoria, las filas se leen del disco al pedirlas).
+        Columnas con otro formato se convierten como en el constructor.
+        """
+        import pyarrow as pa
+        store = cls.__new__(cls)
+        store.headers = [str(h) for h in table.column_names]
+        store._n = table.num_rows
+        store._columns = {}
+        for h, chunked in zip(store.headers, table.columns):
+            arr = chunked.combine_chunks() if chunked.num_chunks != 1 else chunked.chunk(0)
+            if arr.null_count or arr.offset:
+                store._columns[h] = _compact_column(arr.to_pandas())
+            elif pa.types.is_large_string(arr.type):
+                _, offsets, data = arr.buffers()
+                store._columns[h] = _PackedStrings.from_buffers(
+                    memoryview(data) if data is not None else b"",
+                    np.frombuffer(offsets, dtype=np.int64, count=len(arr) + 1))
+            elif pa.types.is_dictionary(arr.type):
+                store._columns[h] = _CategoricalColumn(
+                    arr.indices.to_numpy(zero_copy_only=True), arr.dictionary.to_pylist())
+            elif pa.types.is_integer(arr.type) or pa.types.is_floating(arr.type):
+                store._columns[h] = _NumericColumn(arr.to_numpy(zero_copy_only=True))
+            else:
+                store._columns[h] = _compact_column(arr.to_pandas())
+        return store
+
+
+class Winner:
+    """
+    Ganador (o candidato) compacto: número de premio, posición de la fila en los
+    datos del sorteo, índice original y categoría de premio (sorteos por
+    categorías; None si no hay). No guarda una copia de la fila: los campos se
+    leen de los datos recién al mostrarlos o exportarlos (winner_values).
+    """
+    __slots__ = ("prize", "position", "original_index", "tier")
+
+    def __init__(self, prize: int, position: int, original_index=None, tier: str | None = None):
+        self.prize = prize
+        self.position = position
+        self.original_index = original_index
+        self.tier = tier
+
+    @classmethod
+    def from_record(cls, record: dict) -> "Winner":
+        """Desde un registro del diario (ver sorteo_journal.winner_record)."""
+        return cls(record["prize"], record["position"], record.get("original_index"), record.get("tier"))
+
+    def __repr__(self) -> str:
+        return (f"Winner(prize={self.prize}, position={self.position}, "
+                f"original_index={self.original_index!r}, tier={self.tier!r})")
+
+
+def winner_values(data, winners: list, fields: list) -> list:
+    """
+    Filas [valor de cada campo de `fields`] de los ganadores, en el orden de
+    `winners`, leídas por posición de `data` (DataFrame o ParticipantStore).
+    Solo se materializan esas filas y esos campos; un campo inexistente queda "".
+    """
+    positions = [w.position for w in winners]
+    if hasattr(data, "iloc"):
+        columns = [data[f].iloc[positions].tolist() if f in data.columns else [""] * len(positions)
+                   for f in fields]
+    else:
+        columns = [[data.value(p, f, "") for p in positions] for f in fields]
+    return [list(values) for values in zip(*columns)] if fields else [[] for _ in positions]
+
+
 def remaining_participants(df: pd.DataFrame, winners: list) -> pd.DataFrame:
     """
     Devuelve los participantes no confirmados aún, basándose en el índice 
@@ -32,77 +516,636 @@ def remaining_participants(df: pd.DataFrame, winners: list) -> pd.DataFrame:
         return df
         
     # Obtener una lista de los índices originales de las filas ganadoras
-    confirmed_indices = [w["original_index"] for w in winners]
+    confirmed_indices = [w.original_index for w in winners]
     
     # Devolver el DataFrame excluyendo esos índices
     return df.drop(confirmed_indices, errors='ignore')
 
-def export_winners_xlsx(winners: list, field1: str, field2: str) -> io.BytesIO | None:
-    """Convierte la lista de ganadores en un XLSX (Premio #1 primero)."""
+def export_header(winners: list, field1: str, field2: str) -> list:
+    """Encabezado de la exportación; con categoría solo si algún ganador la tiene."""
+    if any(w.tier is not None for w in winners):
+        return ["Premio", "Categoría", field1, field2]
+    return ["Premio", field1, field2]
+
+def _export_rows(data, winners: list, field1: str, field2: str):
+    """Filas de exportación (Premio #1 primero); los vacíos (NaN) quedan en blanco."""
+    import pandas as pd
+    ordered = sorted(winners, key=lambda x: x.prize)
+    with_tier = any(w.tier is not None for w in ordered)
+    for w, values in zip(ordered, winner_values(data, ordered, [field1, field2])):
+        tier = [w.tier or ""] if with_tier else []
+        yield [f"Premio #{w.prize}"] + tier + [None if pd.isna(v) else v for v in values]
+
+def export_winners_xlsx(data, winners: list, field1: str, field2: str) -> bytes | None:
+    """
+    Convierte la lista de ganadores (Winner sobre `data`) en un XLSX (Premio #1
+    primero). Se escribe fila por fila con xlsxwriter en modo constant_memory,
+    sin armar un DataFrame intermedio.
+    """
     if not winners:
         return None
-        
-    # Ordenar por el número de premio
-    w_sorted = sorted(winners, key=lambda x: x["prize"])
-    rows = []
-    
-    for w in w_sorted:
-        row = {
-            "Premio": f"Premio #{w['prize']}",
-            field1: w["row"].get(field1, ""),
-            field2: w["row"].get(field2, "")
-        }
-        rows.append(row)
-    dfw = pd.DataFrame(rows)
-
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-        dfw.to_excel(writer, index=False, sheet_name="Ganadores")
-    buf.seek(0)
+    import xlsxwriter
+
+    with metrics.timed("export", format="xlsx"):
+        buf = io.BytesIO()
+        wb = xlsxwriter.Workbook(buf, {"constant_memory": True})
+        ws = wb.add_worksheet("Ganadores")
+        header_fmt = wb.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        ws.write_row(0, 0, export_header(winners, field1, field2), header_fmt)
+        for r, row in enumerate(_export_rows(data, winners, field1, field2), start=1):
+            ws.write_row(r, 0, row)
+        wb.close()
     return buf.getvalue() # Devuelve el valor binario del buffer
 
-def pick_candidate(df_left: pd.DataFrame, total: int, current_index: int, rng_seed: int | None):
-    """Devuelve (candidate_data_dict, prize_value) para el siguiente premio."""
-    if df_left.empty:
+def export_winners_csv(data, winners: list, field1: str, field2: str) -> bytes | None:
+    """Variante rápida de export_winners_xlsx en CSV (UTF-8 con BOM para Excel)."""
+    if not winners:
+        return None
+    with metrics.timed("export", format="csv"):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(export_header(winners, field1, field2))
+        writer.writerows(_export_rows(data, winners, field1, field2))
+    return buf.getvalue().encode("utf-8-sig")
+
+def pick_candidate(df_left: pd.DataFrame, total: int, current_index: int, rng: "RaffleRng | None",
+                   pool: "RemainingPool | WeightedPool | None" = None):
+    """
+    Devuelve (Winner candidato, prize_value) para el siguiente premio.
+
+    Si se pasa `pool`, `df_left` es el DataFrame completo y se sortea entre las
+    posiciones del pool sin copiar el DataFrame. `rng` es el flujo aleatorio
+    del sorteo (avanza en cada llamada); None usa el módulo random.
+    """
+    if df_left.empty or (pool is not None and not pool):
         return None, None
         
-    # 1. Configurar y usar la semilla
-    rng = random.Random(rng_seed) if rng_seed is not None else random.Random()
-    
-    # 2. Seleccionar el índice aleatorio (basado en el índice *interno* del df_left)
-    idx_in_left = rng.randrange(len(df_left))
+    # 1. Usar el flujo aleatorio persistente del sorteo
+    rng = rng if rng is not None else random
     
-    # 3. Obtener la fila (dict) y el índice original (crucial para tracking)
-    row_series = df_left.iloc[idx_in_left]
-    row = row_series.to_dict()
-    original_index = row_series.name # Obtiene el índice de la fila original en el df completo
+    with metrics.timed("draw"):
+        # 2. Seleccionar la posición aleatoria (posición *interna* en df_left / en el pool)
+        position = pool.pick(rng) if pool is not None else rng.randrange(len(df_left))
+
+        # 3. Índice original de la fila (crucial para tracking); la fila no se copia
+        original_index = df_left.index[position]
     
     # 4. Determinar el número de premio (siempre es el siguiente)
     prize_value = current_index + 1
     
-    # 5. Estructura de datos del candidato
-    candidate_data = {
-        "row": row,
-        "prize": prize_value,
-        "original_index": original_index # <-- Campo crucial para remaining_participants
-    }
-    
-    # Retorna el diccionario completo de datos del candidato y el valor del premio
-    return candidate_data, prize_value
+    # 5. Candidato compacto: premio, posición en el pool (se quita al confirmar) e índice original
+    return Winner(prize_value, position, original_index), prize_value
+
+def draw_many(df: pd.DataFrame, pool: "RemainingPool | WeightedPool", k: int, current_index: int,
+              rng: "RaffleRng | None") -> list:
+    """
+    Sortea hasta `k` ganadores distintos en una sola pasada y los quita del pool.
+    Devuelve la lista de ganadores (Winner, como pick_candidate) con los
+    números de premio current_index+1, current_index+2, ...
+    """
+    with metrics.timed("draw_many"):
+        positions = pool.take(k, rng if rng is not None else random)
+        if not positions:
+            return []
+        return [
+            Winner(current_index + 1 + i, position, original_index)
+            for i, (position, original_index) in enumerate(zip(positions, df.index[positions].tolist()))
+        ]
+
+# -------- Datos de simulación (sin archivo de entrada, benchmarks) --------
+DUMMY_CITIES = ['Lima', 'Bogotá', 'Santiago', 'Quito', 'Buenos Aires']
+DUMMY_AREAS = ['Desarrollo', 'Ventas', 'Soporte', 'Marketing', 'Finanzas']
+
+def generate_dummy_data(size: int = 500, seed: int | None = None) -> pd.DataFrame:
+    """
+    Participantes ficticios (ID, Nombre_Completo, Email, Ciudad, Area), generados
+    de forma vectorizada para poder crear listas de millones de filas.
+    """
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    ids = pd.Series(np.arange(1, size + 1)).astype(str)
+    padded = ids.str.zfill(3)
+    return pd.DataFrame({
+        'ID': ids,
+        'Nombre_Completo': "Participante " + padded,
+        'Email': "user" + padded + "@mettatec.com",
+        'Ciudad': pd.Categorical.from_codes(rng.integers(len(DUMMY_CITIES), size=size), DUMMY_CITIES).astype(str),
+        'Area': pd.Categorical.from_codes(rng.integers(len(DUMMY_AREAS), size=size), DUMMY_AREAS).astype(str),
+    })
 
 # -------- Carga y normalización de datos --------
-def load_excel_3cols(file) -> pd.DataFrame:
+# Formatos soportados por extensión y, si no la hay, por los primeros bytes
+_EXTENSIONS = {
+    ".xlsx": "xlsx", ".xlsm": "xlsx",
+    ".csv": "csv", ".txt": "csv",
+    ".parquet": "parquet", ".pq": "parquet",
+    ".feather": "feather", ".arrow": "feather", ".ipc": "feather",
+}
+_MAGIC = ((b"PK\x03\x04", "xlsx"), (b"PAR1", "parquet"), (b"ARROW1", "feather"))
+
+
+def _rewind(source):
+    """Vuelve al inicio si `source` es un objeto tipo archivo."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def detect_format(source) -> str:
+    """Devuelve 'xlsx', 'csv', 'parquet' o 'feather' para una ruta o archivo subido."""
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+    ext = os.path.splitext(str(name))[1].lower()
+    if ext in _EXTENSIONS:
+        return _EXTENSIONS[ext]
+    if hasattr(source, "read"):
+        head = source.read(8)
+        _rewind(source)
+    else:
+        with open(source, "rb") as fh:
+            head = fh.read(8)
+    for magic, fmt in _MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return "csv"
+
+
+def _read_xlsx(source, ncols):
+    """XLSX: calamine (Rust) si está instalado; si no, openpyxl en modo read-only por streaming."""
+    import pandas as pd
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        usecols = list(range(ncols)) if ncols else None
+        try:
+            return pd.read_excel(source, engine="calamine", usecols=usecols)
+        except ValueError:
+            # Menos columnas que `ncols`: se lee todo y el llamador valida
+            _rewind(source)
+            return pd.read_excel(source, engine="calamine")
+
+    from openpyxl import load_workbook
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(max_col=ncols, values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        data = list(rows)
+    finally:
+        wb.close()
+    columns = [h if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+    return pd.DataFrame.from_records(data, columns=columns)
+
+
+def _read_csv(source, ncols):
+    import pandas as pd
+    kwargs = {}
+    try:
+        import pyarrow  # noqa: F401
+        kwargs["engine"] = "pyarrow"
+    except ImportError:
+        pass
+    if ncols:
+        header = pd.read_csv(source, nrows=0).columns
+        _rewind(source)
+        kwargs["usecols"] = list(header[:ncols])
+    return pd.read_csv(source, **kwargs)
+
+
+def _read_parquet(source, ncols):
+    import pandas as pd
+    columns = None
+    if ncols:
+        import pyarrow.parquet as pq
+        columns = pq.ParquetFile(source).schema_arrow.names[:ncols]
+        _rewind(source)
+    return pd.read_parquet(source, columns=columns)
+
+
+def _read_feather(source, ncols):
+    import pandas as pd
+    columns = None
+    if ncols:
+        import pyarrow.ipc as ipc
+        columns = ipc.open_file(source).schema.names[:ncols]
+        _rewind(source)
+    return pd.read_feather(source, columns=columns)
+
+
+_READERS = {"xlsx": _read_xlsx, "csv": _read_csv, "parquet": _read_parquet, "feather": _read_feather}
+
+
+def file_digest(source) -> str:
+    """Hash (blake2b) del contenido de una ruta o archivo subido, para usar como clave de caché."""
+    h = hashlib.blake2b(digest_size=16)
+    if hasattr(source, "getvalue"):
+        h.update(source.getvalue())
+    elif hasattr(source, "read"):
+        for chunk in iter(lambda: source.read(1 << 20), b""):
+            h.update(chunk)
+        _rewind(source)
+    else:
+        with open(source, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def read_participants(source, ncols: int | None = None) -> pd.DataFrame:
     """
-    Lee Excel, normaliza columnas, toma solo 3 primeras,
-    elimina filas totalmente vacías.
+    Lee la planilla de participantes (XLSX, CSV, Parquet o Feather) leyendo
+    solo las primeras `ncols` columnas cuando se indica.
     """
-    df = pd.read_excel(file)
-    df = df.dropna(how="all")
-    df.columns = [str(c).strip() for c in df.columns]
-    if df.shape[1] < 3:
+    _rewind(source) # Un archivo subido puede haberse leído antes (p. ej. en otra depuración)
+    fmt = detect_format(source)
+    with metrics.timed("parse", format=fmt):
+        df = _READERS[fmt](source, ncols)
+    metrics.observe("rows_loaded", len(df), format=fmt)
+    return df
+
+
+def load_excel_3cols(file, extra=(), all_columns: bool = False) -> pd.DataFrame:
+    """
+    Lee Excel (o CSV/Parquet/Feather), normaliza columnas, toma solo 3 primeras
+    (más las de `extra` que existan, p. ej. la columna de las categorías de
+    premios; o todas con `all_columns`), elimina filas con las 3 primeras
+    vacías. Con una lista de archivos, los une con load_many (y conserva las
+    columnas de procedencia).
+    """
+    ncols = None if extra or all_columns else 3
+    if isinstance(file, (list, tuple)):
+        df = load_many(file, ncols=ncols)
+        provenance = [SOURCE_FILE_COLUMN, SOURCE_ROW_COLUMN]
+        df = df[[c for c in df.columns if c not in provenance] + provenance]
+    else:
+        df = read_participants(file, ncols=ncols)
+        df.columns = [str(c).strip() for c in df.columns]
+        provenance = []
+    if df.shape[1] - len(provenance) < 3:
         raise ValueError("El Excel debe tener al menos 3 columnas.")
+    if all_columns:
+        keep = list(df.columns)
+    else:
+        keep = list(df.columns[:3]) + [c for c in dict.fromkeys(extra) if c in df.columns[3:]] + provenance
+    df = df.dropna(how="all", subset=keep[:3])
         
     # Aseguramos que el índice original se mantenga para el tracking
-    df_clean = df.iloc[:, :3].copy()
+    df_clean = df[keep].copy()
     
-    return df_clean
\ No newline at end of file
+    return df_clean
+
+
+# -------- Instantáneas binarias (Arrow IPC, mapeadas en memoria) --------
+# La primera carga de una planilla guarda una copia columnar sin comprimir; las
+# siguientes la mapean en memoria (sin copiar ni volver a parsear el XLSX).
+SNAPSHOT_SUFFIX = ".snapshot.arrow"
+# Metadatos de la instantánea: hash del origen, tamaño y fecha de modificación
+_SNAPSHOT_META = b"sorteo"
+
+
+def source_stamp(path: str) -> dict:
+    """Tamaño y fecha de modificación del archivo de origen (para validar la instantánea)."""
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def write_snapshot(table, path: str, meta: dict):
+    """
+    Guarda `table` (tabla Arrow o DataFrame) como archivo Arrow IPC sin comprimir,
+    con `meta` en el esquema. Se escribe a un temporal y se reemplaza (nunca queda
+    una instantánea a medias). Si no se puede escribir, se ignora: es solo una caché.
+    """
+    import json
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return
+    if not isinstance(table, pa.Table):
+        table = pa.Table.from_pandas(table, preserve_index=True)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}), _SNAPSHOT_META: json.dumps(meta).encode("utf-8")
+    }).combine_chunks()
+    tmp = f"{path}.tmp"
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def open_snapshot(path: str):
+    """Mapea la instantánea en memoria y devuelve (tabla Arrow, meta), o None si no existe o no es válida."""
+    import json
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    if not os.path.exists(path):
+        return None
+    try:
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        meta = json.loads((table.schema.metadata or {})[_SNAPSHOT_META])
+    except (OSError, KeyError, ValueError, pa.ArrowInvalid):
+        return None
+    return table, meta
+
+
+def load_participant_store(path: str | list, progress=None) -> tuple:
+    """
+    Devuelve (ParticipantStore, hash) del archivo de participantes usando la
+    instantánea `path + SNAPSHOT_SUFFIX` si corresponde al archivo: mismo tamaño y
+    fecha, o mismo hash si solo cambió la fecha. Si no, lee el archivo y la crea.
+    Con una lista de rutas (expand_sources), las une con load_many.
+    `progress(texto)` se llama en cada etapa.
+    """
+    report = progress or (lambda text: None)
+    if isinstance(path, (list, tuple)):
+        return _load_participant_store_many(list(path), report)
+    snapshot = path + SNAPSHOT_SUFFIX
+    stamp = source_stamp(path)
+    found = open_snapshot(snapshot)
+    if found is not None:
+        table, meta = found
+        if {k: meta.get(k) for k in stamp} == stamp:
+            metrics.count("snapshot_hits")
+            return ParticipantStore.from_arrow(table), meta["digest"]
+        if meta.get("size") == stamp["size"]:
+            report("VERIFICANDO ARCHIVO...")
+            digest = file_digest(path)
+            if digest == meta.get("digest"):
+                write_snapshot(table, snapshot, {"digest": digest, **stamp})
+                metrics.count("snapshot_hits")
+                return ParticipantStore.from_arrow(table), digest
+
+    metrics.count("snapshot_misses")
+    report("LEYENDO ARCHIVO...")
+    df = read_participants(path)
+    df.columns = [str(c).strip() for c in df.columns]
+    report(f"PREPARANDO {len(df)} PARTICIPANTES...")
+    store = ParticipantStore(df)
+    del df # Solo se conserva el almacén columnar
+    digest = file_digest(path)
+    write_snapshot(store.to_arrow(), snapshot, {"digest": digest, **stamp})
+    return store, digest
+
+
+def load_excel_3cols_snapshot(file, digest: str, directory: str) -> pd.DataFrame:
+    """
+    load_excel_3cols (con todas las columnas: peso, categorías, cuotas...) con
+    instantánea por hash de contenido en `directory` (para archivos subidos,
+    que no tienen una ruta propia). Las columnas de texto quedan
+    respaldadas por el archivo mapeado: solo las filas sorteadas se vuelven objetos.
+    """
+    path = os.path.join(directory, digest + SNAPSHOT_SUFFIX)
+    found = open_snapshot(path)
+    # Las instantáneas anteriores guardaban solo 3 columnas: no valen
+    if found is not None and found[1].get("digest") == digest and found[1].get("all_columns"):
+        metrics.count("snapshot_hits")
+        return found[0].to_pandas(split_blocks=True)
+    metrics.count("snapshot_misses")
+    df = load_excel_3cols(file, all_columns=True)
+    write_snapshot(df, path, {"digest": digest, "all_columns": True})
+    return df
+
+
+# -------- Varios archivos (p. ej. una planilla por sede) --------
+# Columnas de procedencia que agrega load_many: archivo de origen y fila en ese
+# archivo (la 1 es el encabezado, como en la planilla)
+SOURCE_FILE_COLUMN = "Archivo"
+SOURCE_ROW_COLUMN = "Fila"
+# Desde cuántos archivos load_many los parsea en procesos aparte (el parseo de
+# XLSX es de CPU y retiene el GIL: con hilos no se gana nada)
+PARALLEL_MIN_FILES = 2
+
+
+def expand_sources(spec, skip=()) -> list:
+    """
+    Rutas de participantes de `spec`: una carpeta (sus archivos de formato
+    soportado), un patrón glob, una ruta o una lista de ellos, en orden. Se
+    omiten las instantáneas, los temporales de Office (~$) y los nombres de `skip`.
+    """
+    import glob
+    if isinstance(spec, (list, tuple)):
+        return [p for item in spec for p in expand_sources(item, skip)]
+    spec = os.fspath(spec)
+    if os.path.isdir(spec):
+        paths = sorted(os.path.join(spec, name) for name in os.listdir(spec))
+        paths = [p for p in paths if os.path.isfile(p) and os.path.splitext(p)[1].lower() in _EXTENSIONS]
+    elif glob.has_magic(spec):
+        paths = sorted(p for p in glob.glob(spec) if os.path.isfile(p))
+    else:
+        return [spec] if os.path.exists(spec) else []
+    skip = set(skip)
+    return [p for p in paths if not p.endswith(SNAPSHOT_SUFFIX)
+            and not os.path.basename(p).startswith(("~$", "."))
+            and os.path.basename(p) not in skip]
+
+
+def source_name(source) -> str:
+    """Nombre de una ruta o archivo subido (columna de procedencia)."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(os.fspath(source))
+    return getattr(source, "name", "")
+
+
+def sources_digest(sources) -> str:
+    """Hash de varios archivos (nombre y contenido de cada uno, en orden): clave de caché y del sorteo."""
+    h = hashlib.blake2b(digest_size=16)
+    for source in sources:
+        h.update(f"{source_name(source)}\0{file_digest(source)}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _job_source(source):
+    """Ruta tal cual; un archivo subido no se puede pasar a otro proceso: viaja como (nombre, bytes)."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    if hasattr(source, "getvalue"):
+        return source_name(source), source.getvalue()
+    _rewind(source)
+    return source_name(source), source.read()
+
+
+def _parse_source(job) -> pd.DataFrame:
+    """Lee un archivo en un proceso de load_many: `job` = (ruta o (nombre, bytes), ncols)."""
+    source, ncols = job
+    if isinstance(source, tuple):
+        name, data = source
+        source = io.BytesIO(data)
+        source.name = name # detect_format usa la extensión
+    df = read_participants(source, ncols)
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def load_many(sources, ncols: int | None = None, workers: int | None = None, progress=None) -> pd.DataFrame:
+    """
+    Lee varios archivos de participantes (rutas o archivos subidos) y los une en
+    un solo DataFrame, en el orden de `sources`, con las columnas de procedencia
+    SOURCE_FILE_COLUMN y SOURCE_ROW_COLUMN al final. Todos deben tener los
+    mismos encabezados que el primero (ValueError si no). Desde
+    PARALLEL_MIN_FILES archivos se parsean en un pool de hasta `workers`
+    procesos (None = uno por CPU; 1 = en este proceso).
+    `progress(texto)` se llama con cada archivo leído.
+    """
+    import pandas as pd
+    if not sources:
+        raise ValueError("No hay archivos de participantes para unir.")
+    report = progress or (lambda text: None)
+    names = [source_name(src) for src in sources]
+    jobs = [(_job_source(src), ncols) for src in sources]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+
+    def results():
+        done = 0
+        if len(jobs) >= PARALLEL_MIN_FILES and workers > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            from concurrent.futures.process import BrokenProcessPool
+            try:
+                # spawn: sin heredar los hilos del proceso (servidor web, interfaz); las
+                # métricas de los hijos se descartan para no pisar los archivos del principal
+                with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=metrics.detach) as pool:
+                    for df in pool.map(_parse_source, jobs):
+                        done += 1
+                        yield df
+                return
+            except (OSError, BrokenProcessPool):
+                pass # Sin procesos hijos (entorno restringido, ejecutable empaquetado): sigue en este proceso
+        yield from map(_parse_source, jobs[done:])
+
+    frames = []
+    with metrics.timed("load_many"):
+        parsed = results()
+        for name in names:
+            try:
+                df = next(parsed)
+            except Exception as e:
+                raise ValueError(f"{name}: {e}") from e
+            if frames and list(df.columns) != list(frames[0].columns):
+                raise ValueError(f"{name}: las columnas ({', '.join(map(str, df.columns))}) no coinciden "
+                                 f"con las de {names[0]} ({', '.join(map(str, frames[0].columns))}).")
+            frames.append(df)
+            report(f"LEYENDO ARCHIVOS: {len(frames)} DE {len(names)}...")
+        sizes = [len(df) for df in frames]
+        merged = pd.concat(frames, ignore_index=True)
+        del frames
+        # Categórica: un código por fila en lugar de repetir el nombre del archivo
+        unique = list(dict.fromkeys(names))
+        codes = np.repeat([unique.index(name) for name in names], sizes)
+        merged[SOURCE_FILE_COLUMN] = pd.Categorical.from_codes(codes, unique)
+        merged[SOURCE_ROW_COLUMN] = np.concatenate([np.arange(2, n + 2, dtype=np.int64) for n in sizes])
+    metrics.observe("files_loaded", len(names))
+    return merged
+
+
+def _load_participant_store_many(paths: list, report) -> tuple:
+    """
+    load_participant_store de varias rutas: una instantánea del conjunto unido
+    (en la carpeta común), válida mientras no cambie ningún archivo (nombre,
+    tamaño y fecha de cada uno).
+    """
+    if not paths:
+        raise FileNotFoundError("No se encontraron archivos de participantes.")
+    paths = [os.path.abspath(p) for p in paths]
+    base = os.path.commonpath([os.path.dirname(p) for p in paths])
+    key = hashlib.blake2b("\n".join(paths).encode("utf-8"), digest_size=6).hexdigest()
+    snapshot = os.path.join(base, f"participantes_{key}{SNAPSHOT_SUFFIX}")
+    stamp = [[os.path.relpath(p, base), *source_stamp(p).values()] for p in paths]
+    found = open_snapshot(snapshot)
+    if found is not None and found[1].get("files") == stamp:
+        metrics.count("snapshot_hits")
+        return ParticipantStore.from_arrow(found[0]), found[1]["digest"]
+
+    metrics.count("snapshot_misses")
+    report(f"LEYENDO {len(paths)} ARCHIVOS...")
+    df = load_many(paths, progress=report)
+    report(f"PREPARANDO {len(df)} PARTICIPANTES...")
+    store = ParticipantStore(df)
+    del df
+    digest = sources_digest(paths)
+    write_snapshot(store.to_arrow(), snapshot, {"digest": digest, "files": stamp})
+    return store, digest
+
+
+# -------- Depuración y elegibilidad --------
+def normalize_keys(values) -> pd.Series:
+    """
+    Normaliza claves para comparar participantes: sin espacios sobrantes, sin
+    mayúsculas ni tildes, y los IDs numéricos leídos como float ("123.0") como
+    enteros. Los vacíos quedan como "".
+    """
+    import pandas as pd
+    keys = pd.Series(values).astype("string")
+    keys = (keys.str.strip()
+                .str.replace(r"\s+", " ", regex=True)
+                .str.replace(r"^(-?\d+)\.0+$", r"\1", regex=True)
+                .str.normalize("NFKD")
+                .str.replace("[\u0300-\u036f]", "", regex=True) # Marcas diacríticas (tildes)
+                .str.casefold())
+    return keys.fillna("").reset_index(drop=True)
+
+
+def read_keys(source, field: str) -> pd.Series:
+    """
+    Claves normalizadas de la columna `field` de un archivo (lista de exclusión,
+    ganadores anteriores...). Si el archivo tiene una sola columna, se usa esa.
+    """
+    df = read_participants(source)
+    df.columns = [str(c).strip() for c in df.columns]
+    if field not in df.columns:
+        if len(df.columns) != 1:
+            raise ValueError(f"El archivo no tiene la columna '{field}'.")
+        field = df.columns[0]
+    return normalize_keys(df[field])
+
+
+def eligibility_mask(keys, exclude=(), previous_winners=(), dedup=False) -> tuple:
+    """
+    Devuelve (máscara, reporte) sobre las claves de los participantes: quedan
+    afuera los de las listas de exclusión, los ganadores anteriores y, con
+    `dedup`, los duplicados (se conserva la primera aparición; sin `dedup` cada
+    fila es una participación, aunque se repita la clave). Todo con tablas hash (duplicated /
+    isin), sin recorrer filas en Python. Las claves vacías no se comparan.
+
+    `exclude` y `previous_winners` son colecciones de claves ya normalizadas
+    (ver read_keys). El reporte cuenta cada fila en la primera regla que la
+    deja afuera: {"total", "duplicates", "excluded", "previous_winners", "eligible"}.
+    """
+    import pandas as pd
+    keys = normalize_keys(keys)
+    present = (keys != "").to_numpy()
+    mask = np.ones(len(keys), dtype=bool)
+    report = {"total": len(keys)}
+
+    def drop(name, hit):
+        hit = np.asarray(hit, dtype=bool) & present & mask
+        report[name] = int(hit.sum())
+        mask[hit] = False
+
+    drop("duplicates", keys.duplicated() if dedup else np.zeros(len(keys), dtype=bool))
+    for name, lists in (("excluded", exclude), ("previous_winners", previous_winners)):
+        hit = np.zeros(len(keys), dtype=bool)
+        for blocked in lists:
+            hit |= keys.isin(pd.Index(blocked)).to_numpy()
+        drop(name, hit)
+    report["eligible"] = int(mask.sum())
+    return mask, report
+
+
+def prepare_participants(df: pd.DataFrame, key: str, exclude=(), previous_winners=(), dedup=False) -> tuple:
+    """
+    Etapa de depuración tras la carga: devuelve (DataFrame habilitado, reporte)
+    según eligibility_mask sobre la columna `key`. Se conserva el índice original.
+    """
+    mask, report = eligibility_mask(df[key], exclude, previous_winners, dedup)
+    return (df if mask.all() else df[mask]), report
@@ -0,0 +1,273 @@
+"""
+Métricas de las rutas críticas: carga, sorteo, exportación e interfaz.
+
+Desactivadas por defecto: sin destinos, `timed` devuelve un contexto vacío
+compartido y `count` / `observe` vuelven en la primera línea, así que los
+ganchos quedan en el código sin costo apreciable. Se activan con la variable
+de entorno SORTEO_METRICS, una lista de destinos separados por coma:
+
+    log:RUTA    una línea JSON por medición (se agrega al final)
+    prom:RUTA   archivo de texto en formato Prometheus (textfile collector)
+    memory      acumulados en memoria, para el panel de depuración de la app
+
+o desde código con configure() / add_sink(). Solo usa la biblioteca estándar.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+
+ENV_VAR = "SORTEO_METRICS"
+# Prefijo de las métricas en el archivo de Prometheus
+PROM_PREFIX = "sorteo_"
+# Cada cuántos segundos, como mucho, se reescribe el archivo de Prometheus
+PROM_FLUSH_SECONDS = 5.0
+# Mediciones individuales que guarda el destino en memoria
+MEMORY_RECENT = 200
+
+# Destinos activos; vacío = métricas desactivadas
+_sinks = []
+
+
+class _Aggregate:
+    """Acumulado de una métrica (por nombre y etiquetas): cantidad, suma, máximo y último valor."""
+    __slots__ = ("count", "total", "max", "last")
+
+    def __init__(self):
+        self.count, self.total, self.max, self.last = 0, 0.0, float("-inf"), 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.last = value
+
+
+class _AggregatingSink:
+    """Base de los destinos que acumulan por (tipo, nombre, etiquetas)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.aggregates = {}
+
+    def record(self, kind: str, name: str, value: float, labels: dict):
+        key = (kind, name, tuple(sorted(labels.items())))
+        with self.lock:
+            agg = self.aggregates.get(key)
+            if agg is None:
+                agg = self.aggregates[key] = _Aggregate()
+            agg.add(value)
+
+
+class LogSink:
+    """Una línea JSON por medición: {"ts", "kind", "name", "value", "labels"}."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self._fh = open(path, "a", encoding="utf-8", buffering=1)
+
+    def record(self, kind: str, name: str, value: float, labels: dict):
+        line = json.dumps({"ts": time.time(), "kind": kind, "name": name, "value": value, "labels": labels},
+                          ensure_ascii=False)
+        with self.lock:
+            self._fh.write(line + "\n")
+
+    def close(self):
+        self._fh.close()
+
+
+class PrometheusSink(_AggregatingSink):
+    """
+    Archivo de texto para el textfile collector de node_exporter. Los tiempos
+    son resúmenes (_count, _sum) más un _max; los contadores, _total; las
+    observaciones, el último valor. Se reescribe entero (temporal + reemplazo)
+    cada `flush_seconds` como mucho, y al salir del proceso.
+    """
+
+    def __init__(self, path: str, flush_seconds: float = PROM_FLUSH_SECONDS):
+        super().__init__()
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self._flushed = 0.0
+
+    def record(self, kind: str, name: str, value: float, labels: dict):
+        super().record(kind, name, value, labels)
+        if time.monotonic() - self._flushed >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            self._flushed = time.monotonic()
+            items = sorted(self.aggregates.items(), key=lambda kv: (kv[0][1], kv[0][0], kv[0][2]))
+            lines, typed = [], set()
+            for (kind, name, labels), agg in items:
+                tags = ",".join(f'{k}="{v}"' for k, v in labels)
+                tags = "{" + tags + "}" if tags else ""
+                if kind == "timer":
+                    metric = f"{PROM_PREFIX}{name}_seconds"
+                    series = [("summary", metric + "_count", agg.count), ("summary", metric + "_sum", agg.total),
+                              ("gauge", metric + "_max", agg.max)]
+                    types = {metric: "summary", metric + "_max": "gauge"}
+                elif kind == "counter":
+                    metric = f"{PROM_PREFIX}{name}_total"
+                    series, types = [("counter", metric, agg.total)], {metric: "counter"}
+                else:
+                    metric = f"{PROM_PREFIX}{name}"
+                    series, types = [("gauge", metric, agg.last)], {metric: "gauge"}
+                for family, kind_name in types.items():
+                    if family not in typed:
+                        typed.add(family)
+                        lines.append(f"# TYPE {family} {kind_name}")
+                lines.extend(f"{metric}{tags} {value:.6g}" for _, metric, value in series)
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                fh.write("\n".join(lines) + "\n")
+            os.replace(tmp, self.path)
+        except OSError:
+            pass # Las métricas nunca interrumpen el sorteo
+
+    close = flush
+
+
+class MemorySink(_AggregatingSink):
+    """Acumulados y últimas MEMORY_RECENT mediciones en memoria (panel de depuración)."""
+
+    def __init__(self, recent: int = MEMORY_RECENT):
+        super().__init__()
+        self.recent = deque(maxlen=recent)
+
+    def record(self, kind: str, name: str, value: float, labels: dict):
+        super().record(kind, name, value, labels)
+        self.recent.append((time.time(), kind, name, value, labels))
+
+    def snapshot(self) -> list:
+        """Una fila (dict) por métrica: tipo, cantidad, total, promedio, máximo y último valor."""
+        with self.lock:
+            items = sorted(self.aggregates.items(), key=lambda kv: (kv[0][1], kv[0][2]))
+            return [
+                {"métrica": name + "".join(f" {k}={v}" for k, v in labels), "tipo": kind,
+                 "n": agg.count, "total": agg.total, "promedio": agg.total / agg.count,
+                 "máximo": agg.max, "último": agg.last}
+                for (kind, name, labels), agg in items
+            ]
+
+    def close(self):
+        pass
+
+
+# -------- Registro de destinos --------
+def enabled() -> bool:
+    return bool(_sinks)
+
+
+def add_sink(sink):
+    _sinks.append(sink)
+    return sink
+
+
+def configure(spec: str | None = None) -> list:
+    """
+    Reemplaza los destinos según `spec` ("log:RUTA,prom:RUTA,memory"; None =
+    la variable de entorno SORTEO_METRICS; "" = desactivar). Devuelve los destinos.
+    """
+    spec = os.environ.get(ENV_VAR, "") if spec is None else spec
+    for sink in _sinks:
+        sink.close()
+    _sinks.clear()
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, path = item.partition(":")
+        if kind == "log" and path:
+            add_sink(LogSink(path))
+        elif kind == "prom" and path:
+            add_sink(PrometheusSink(path))
+        elif kind == "memory":
+            add_sink(MemorySink())
+        else:
+            raise ValueError(f"Destino de métricas no válido: {item!r}")
+    return list(_sinks)
+
+
+def detach():
+    """
+    Quita los destinos sin cerrarlos ni escribirlos: para procesos hijos (p. ej.
+    los de load_many), cuyos archivos de métricas son del proceso principal.
+    """
+    _sinks.clear()
+
+
+def memory_sink() -> MemorySink | None:
+    """El destino en memoria activo (para mostrar el panel de depuración), o None."""
+    return next((sink for sink in _sinks if isinstance(sink, MemorySink)), None)
+
+
+# -------- Mediciones --------
+def _emit(kind: str, name: str, value: float, labels: dict):
+    for sink in _sinks:
+        sink.record(kind, name, value, labels)
+
+
+class _NullTimer:
+    __slots__ = ()
+    seconds = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "start", "seconds")
+
+    def __init__(self, name: str, labels: dict):
+        self.name, self.labels, self.seconds = name, labels, None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        _emit("timer", self.name, self.seconds, self.labels)
+        return False
+
+
+def timed(name: str, **labels):
+    """Contexto que mide la duración del bloque (`<name>_seconds`). Desactivado: no hace nada."""
+    if not _sinks:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+
+def count(name: str, n: int = 1, **labels):
+    """Suma `n` al contador `<name>_total`."""
+    if _sinks:
+        _emit("counter", name, n, labels)
+
+
+def observe(name: str, value: float, **labels):
+    """Registra un valor puntual (filas cargadas, ganadores en la lista...)."""
+    if _sinks:
+        _emit("value", name, value, labels)
+
+
+def _close_all():
+    for sink in _sinks:
+        sink.close()
+
+
+try:
+    configure()
+except (ValueError, OSError) as e:
+    import warnings
+    warnings.warn(f"{ENV_VAR}: {e}; métricas desactivadas")
+    _sinks.clear()
+atexit.register(_close_all)
@@ -0,0 +1,347 @@
+"""
+Registro de sorteos compartidos entre sesiones de la app web.
+
+Cada sorteo (clave = id) guarda un solo pool de participantes, una sola lista
+de ganadores y su diario. Varios anfitriones pueden operarlo a la vez y
+cualquier cantidad de espectadores lo sigue en modo solo lectura, pidiendo
+solo los cambios posteriores a la última versión que vieron (changes_since).
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+
+from sorteo_logic import (
+    RaffleRng, Winner, make_pool, column_weights, pick_candidate, draw_many, winner_values,
+    export_winners_xlsx, export_winners_csv,
+)
+import sorteo_metrics as metrics
+from sorteo_tiers import PrizeTier, TierDraw, GroupIndex, pending_quota, quota_pick, quota_draw
+from sorteo_journal import JOURNAL_DIR, RaffleJournal, journal_path, read_events, replay, winner_record
+
+# Sorteos que se mantienen en memoria; al superarlo se descarta el menos usado
+MAX_RAFFLES = 16
+# Cambios recientes que se guardan para los espectadores (un espectador más atrasado
+# pierde solo los avisos más viejos: la tabla siempre se lee del estado actual)
+MAX_CHANGES = 256
+
+
+class SharedRaffle:
+    """
+    Estado de un sorteo compartido. Todas las operaciones que lo modifican
+    toman el lock, registran el evento en el diario y suben `version`.
+    """
+
+    def __init__(self, raffle_id: str, df, digest: str | None = None, seed: int | None = None,
+                 journal_dir: str = JOURNAL_DIR, history=None, key_field: str | None = None):
+        self.id = raffle_id
+        self.df = df # Compartido y de solo lectura
+        self.digest = digest
+        self.lock = threading.RLock()
+        self.num_winners = 3
+        self.weight_field = None
+        self.tiers = [] # Categorías de premios (PrizeTier); vacío = una sola lista de premios
+        self.quota = None # Cuota por grupo {"field", "min"}: al menos `min` ganadores por valor de `field`
+        self._groups = None # GroupIndex de la columna de la cuota (se calcula una vez)
+        self.seed = seed
+        self.rng = RaffleRng(seed)
+        self.winners = [] # Lista de Winner (premio, posición, índice original); las filas se leen de df
+        self.candidate = None
+        self.version = 0 # Sube con cada evento (también sorteos sin confirmar)
+        self.winners_version = 0 # Sube solo cuando cambia la lista de ganadores
+        self._changes = deque(maxlen=MAX_CHANGES) # (version, evento, datos) recientes, para los espectadores
+        self._outputs = {} # Tabla/exportaciones ya generadas, compartidas por todas las sesiones
+        self._pending = {} # Cuota pendiente por (columna, mínimo); vale hasta el próximo evento o pool nuevo
+        self.journal = None
+        # Historial entre sorteos (sorteo_history.WinnersHistory): los ganadores se
+        # registran por la columna clave, con el hash de la planilla como evento
+        self.history = history if digest is not None and key_field else None
+        self.key_field = key_field
+        # Evento del historial de esta vuelta del sorteo: el id de la planilla depurada,
+        # y "<id>:<n>" para cada vuelta nueva tras reiniciar un sorteo completo
+        self.history_event = digest
+        self.resumed = False
+        if digest is not None:
+            path = journal_path(digest, journal_dir)
+            self.resumed = self._restore(replay(read_events(path)))
+            self.journal = RaffleJournal(path)
+            if not self.resumed:
+                self._log("start", digest=digest, n=len(df))
+        self._rebuild_pool()
+
+    # -------- Internos --------
+    def _restore(self, state: dict) -> bool:
+        """Recupera un sorteo en curso desde el diario (mismos datos); devuelve si lo hizo."""
+        start = state["start"]
+        if start is None or start.get("n") != len(self.df) or state["rng"] is None:
+            return False
+        self.rng = RaffleRng.from_dict(state["rng"])
+        # Semilla elegida por el anfitrión (None = sin semilla): no es la entropía del flujo,
+        # que viaja en "rng" y solo se usa para continuar el sorteo
+        self.seed = state["seed"]
+        self.num_winners = state["num_winners"] or self.num_winners
+        self.weight_field = state["weight_field"]
+        self.tiers = [PrizeTier.from_dict(d) for d in state["tiers"] or []]
+        self.quota = state["quota"]
+        self.history_event = state["history_event"] or self.history_event
+
+        def restore(rec):
+            return Winner(rec["prize"], rec["position"], self.df.index[rec["position"]], rec.get("tier"))
+
+        self.winners = [restore(rec) for rec in state["winners"]]
+        if state["candidate"] is not None:
+            self.candidate = restore(state["candidate"])
+        return True
+
+    def _rebuild_pool(self):
+        """
+        Construye el pool (con pesos si hay columna de peso; uno por categoría si
+        hay categorías) sin los ganadores ya confirmados.
+        """
+        weights = column_weights(self.df, self.weight_field) if self.weight_field else None
+        if self.tiers:
+            self.pool = TierDraw(self.df, self.tiers, weights)
+            self.num_winners = self.pool.num_winners
+        else:
+            self.pool = make_pool(len(self.df), weights)
+        for w in self.winners:
+            self.pool.remove(w.position)
+        self._pending.clear()
+
+    def _record(self, winners: list):
+        if self.history is not None:
+            keys = winner_values(self.df, winners, [self.key_field])
+            self.history.add(self.history_event, [(key, w.prize) for (key,), w in zip(keys, winners)])
+
+    def _log(self, event: str, winners_changed: bool = False, **data):
+        """Registra el evento en el diario y en la lista de cambios para los espectadores."""
+        if self.journal is not None:
+            self.journal.append(event, rng=self.rng.to_dict(), num_winners=int(self.num_winners),
+                                weight_field=self.weight_field, tiers=[t.to_dict() for t in self.tiers],
+                                quota=self.quota, seed=self.seed, history_event=self.history_event, **data)
+        self.version += 1
+        self._pending.clear()
+        # Los espectadores no necesitan la lista de ganadores de draw_many (la leen del sorteo)
+        self._changes.append((self.version, event, {k: v for k, v in data.items() if k != "winners"}))
+        if winners_changed:
+            self.winners_version += 1
+            self._outputs.clear()
+
+    # -------- Lectura --------
+    @property
+    def current_index(self) -> int:
+        """Cantidad de ganadores confirmados."""
+        return len(self.winners)
+
+    def next_prize(self) -> int | None:
+        """
+        Número del próximo premio a sortear. Con categorías se saltan las que se
+        quedaron sin participantes (sus premios quedan sin asignar); None si no
+        queda ningún premio sorteable.
+        """
+        if not self.tiers:
+            return self.current_index + 1
+        return self.pool.next_prize({w.prize for w in self.winners})
+
+    def changes_since(self, version: int) -> tuple:
+        """Devuelve (versión actual, [(versión, evento, datos), ...] posteriores a `version`)."""
+        with self.lock:
+            # Los cambios están ordenados por versión: se recorren desde el final
+            i = len(self._changes)
+            while i > 0 and self._changes[i - 1][0] > version:
+                i -= 1
+            return self.version, list(islice(self._changes, i, None))
+
+    def group_index(self, field: str) -> GroupIndex:
+        """Grupos de la columna `field` (para las cuotas); se calculan una vez por columna."""
+        with self.lock:
+            if self._groups is None or self._groups.field != field:
+                self._groups = GroupIndex(self.df, field)
+            return self._groups
+
+    def pending_quota(self, quota: dict | None) -> int:
+        """
+        Ganadores que `quota` aún exigiría dados los ya confirmados (0 sin cuota o con
+        categorías). Se calcula una vez por cuota hasta que cambie el pool: la app lo
+        consulta en cada ejecución.
+        """
+        if not quota or self.tiers:
+            return 0
+        key = (quota["field"], quota["min"])
+        with self.lock:
+            if key not in self._pending:
+                self._pending[key] = pending_quota(self.pool, self.group_index(quota["field"]), quota["min"],
+                                                   [w.position for w in self.winners])
+            return self._pending[key]
+
+    def row(self, winner: Winner) -> dict:
+        """Fila completa de un ganador o candidato (se materializa al mostrarla)."""
+        return self.df.iloc[winner.position].to_dict()
+
+    def output(self, kind: str, field1: str, field2: str):
+        """Tabla ('table') o archivo ('xlsx', 'csv') de ganadores; se genera una vez por versión y campos."""
+        key = (kind, field1, field2)
+        with self.lock:
+            if key not in self._outputs:
+                if kind == "xlsx":
+                    value = export_winners_xlsx(self.df, self.winners, field1, field2)
+                elif kind == "csv":
+                    value = export_winners_csv(self.df, self.winners, field1, field2)
+                else:
+                    import pandas as pd
+                    with metrics.timed("winners_table_build", app="web"):
+                        ordered = sorted(self.winners, key=lambda x: x.prize)
+                        value = pd.DataFrame([
+                            {"Premio": f"Premio #{w.prize}", **({"Categoría": w.tier} if self.tiers else {}),
+                             field1: v1, field2: v2}
+                            for w, (v1, v2) in zip(ordered, winner_values(self.df, ordered, [field1, field2]))
+                        ])
+                self._outputs[key] = value
+            return self._outputs[key]
+
+    # -------- Operaciones (anfitriones) --------
+    def configure(self, num_winners: int, weight_field: str | None, seed: int | None, tiers=None,
+                  quota: dict | None = None):
+        """
+        Aplica la configuración; el pool y el flujo aleatorio solo se rehacen si
+        cambian. Con categorías (`tiers`), la cantidad de premios es su suma. Las
+        categorías, la cuota por grupo (`quota`, que no se aplica a los sorteos
+        por categorías), la columna de peso y la semilla solo cambian mientras no
+        haya ganadores ni candidato: a mitad del sorteo cambiarían las chances o
+        volverían a empezar el flujo aleatorio. Después solo cambia la cantidad.
+        """
+        with self.lock:
+            if not self.tiers:
+                self.num_winners = num_winners
+            if self.winners or self.candidate is not None:
+                return
+            self.quota = quota or None
+            tiers = list(tiers or [])
+            if tiers != self.tiers or weight_field != self.weight_field:
+                self.tiers = tiers
+                self.weight_field = weight_field
+                self._rebuild_pool()
+                if not self.tiers:
+                    self.num_winners = num_winners
+            if seed != self.seed:
+                self.seed = seed
+                self.rng = RaffleRng(seed)
+
+    def draw(self):
+        """Sortea un candidato para el siguiente premio (queda pendiente de confirmación)."""
+        with self.lock:
+            if self.candidate is not None or self.current_index >= self.num_winners:
+                return self.candidate
+            prize = self.next_prize()
+            if prize is None:
+                return None
+            if self.quota and not self.tiers:
+                cand_data = None
+                if self.pool:
+                    # Con cuotas pendientes y premios justos, el candidato sale de un grupo que las tenga
+                    position = quota_pick(self.pool, self.group_index(self.quota["field"]), self.quota["min"],
+                                          [w.position for w in self.winners],
+                                          self.num_winners - self.current_index, self.rng)
+                    cand_data = Winner(prize, position, self.df.index[position])
+            else:
+                pool = self.pool.pool_for(prize) if self.tiers else self.pool
+                cand_data, _ = pick_candidate(self.df, self.num_winners, prize - 1, self.rng, pool=pool)
+            if cand_data is not None:
+                if self.tiers:
+                    cand_data.tier = self.tiers[self.pool.tier_of(prize)].name
+                self.candidate = cand_data
+                self._log("draw", **winner_record(cand_data))
+            return cand_data
+
+    def confirm(self):
+        """Confirma el candidato pendiente como ganador."""
+        with self.lock:
+            if self.candidate is None:
+                return
+            cand_data, self.candidate = self.candidate, None
+            self.winners.append(cand_data)
+            self.pool.remove(cand_data.position)
+            self._log("confirm", winners_changed=True, **winner_record(cand_data))
+            self._record([cand_data])
+
+    def redraw(self):
+        """Descarta el candidato pendiente sin confirmarlo."""
+        with self.lock:
+            if self.candidate is not None:
+                self.candidate = None
+                self._log("redraw")
+
+    def draw_remaining(self) -> list:
+        """Sortea y confirma de una vez todos los premios restantes."""
+        with self.lock:
+            if self.candidate is not None:
+                return []
+            if self.tiers:
+                # Todas las categorías que faltan, una tras otra
+                drawn = self.pool.draw_all(self.rng, awarded={w.prize for w in self.winners})
+            elif self.quota:
+                positions = quota_draw(self.pool, self.group_index(self.quota["field"]), self.quota["min"],
+                                       self.num_winners - self.current_index, self.rng,
+                                       taken=[w.position for w in self.winners])
+                drawn = [Winner(self.current_index + 1 + i, pos, self.df.index[pos]) for i, pos in enumerate(positions)]
+            else:
+                drawn = draw_many(self.df, self.pool, self.num_winners - self.current_index, self.current_index, self.rng)
+            if drawn:
+                self.winners.extend(drawn)
+                self._log("draw_many", winners_changed=True, winners=[winner_record(w) for w in drawn])
+                self._record(drawn)
+            return drawn
+
+    def reset(self):
+        """
+        Reinicia el sorteo manteniendo los datos. Los ganadores de una vuelta sin
+        terminar se borran del historial; los de una completa quedan (los premios
+        ya se entregaron y deben seguir contando para "últimos N sorteos") y la
+        vuelta siguiente se registra como un evento propio.
+        """
+        with self.lock:
+            finished = self.current_index >= self.num_winners or self.next_prize() is None
+            if self.history is not None and self.winners and not finished:
+                self.history.clear(self.history_event)
+            if finished and self.digest is not None:
+                self.history_event = f"{self.digest}:{time.time_ns()}"
+            self.winners, self.candidate = [], None
+            self.rng = RaffleRng(self.seed)
+            self._rebuild_pool()
+            self._log("reset", winners_changed=True)
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+
+class RaffleRegistry:
+    """Sorteos activos del proceso, por id. El id se deriva del hash de la planilla."""
+
+    def __init__(self, max_raffles: int = MAX_RAFFLES):
+        self.max_raffles = max_raffles
+        self._raffles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, digest: str, df, seed: int | None = None, history=None,
+             key_field: str | None = None) -> SharedRaffle:
+        """Devuelve el sorteo de esa planilla, creándolo (o recuperándolo del diario) si no existe."""
+        raffle_id = digest[:12]
+        with self._lock:
+            raffle = self._raffles.get(raffle_id)
+            if raffle is None:
+                raffle = self._raffles[raffle_id] = SharedRaffle(raffle_id, df, digest, seed,
+                                                                     history=history, key_field=key_field)
+                while len(self._raffles) > self.max_raffles:
+                    _, evicted = self._raffles.popitem(last=False)
+                    evicted.close()
+            self._raffles.move_to_end(raffle_id)
+            return raffle
+
+    def get(self, raffle_id: str) -> SharedRaffle | None:
+        """Sorteo activo con ese id (None si no existe o fue descartado)."""
+        with self._lock:
+            raffle = self._raffles.get(raffle_id)
+            if raffle is not None:
+                self._raffles.move_to_end(raffle_id)
+            return raffle
@@ -0,0 +1,335 @@
+"""
+Sorteos por categorías de premios (p. ej. 1 premio mayor entre todos, 50
+medianos para Lima y 2.000 menores por Area) y con cuotas por grupo (al
+menos K ganadores por Ciudad o Area).
+
+Los participantes se particionan una sola vez por cada columna que usan las
+categorías (posiciones de fila por valor) y cada categoría sortea de su propio
+pool sobre esas posiciones. Los premios se numeran en el orden de las
+categorías (la primera tiene los premios #1, #2, ...). Quien gana en una
+categoría sale de los pools de todas las demás: nadie gana dos veces.
+
+Para sortear todo de una vez, las categorías se sortean una tras otra, en su
+orden y con el mismo flujo aleatorio: cada una ya no ve a quienes ganaron en
+las anteriores. (Hilos no sirven aquí: los sorteos son bucles de Python que
+toman el GIL.)
+"""
+import numpy as np
+
+import sorteo_metrics as metrics
+from sorteo_logic import Winner, make_pool
+
+
+class PrizeTier:
+    """
+    Categoría de premios: nombre, cantidad de premios y, opcionalmente, la
+    columna y los valores de quienes participan en ella (None = todos).
+    """
+    __slots__ = ("name", "count", "field", "values")
+
+    def __init__(self, name: str, count: int, field: str | None = None, values=None):
+        self.name = name
+        self.count = int(count)
+        self.field = field or None
+        self.values = tuple(values) if self.field and values else None
+
+    @classmethod
+    def parse(cls, spec: str) -> "PrizeTier":
+        """Desde el formato de texto 'NOMBRE:CANTIDAD[:COLUMNA=VALOR1|VALOR2]'."""
+        parts = [p.strip() for p in spec.split(":", 2)]
+        if len(parts) < 2 or not parts[0]:
+            raise ValueError(f"Categoría no válida (NOMBRE:CANTIDAD[:COLUMNA=VALORES]): {spec!r}")
+        try:
+            count = int(parts[1])
+        except ValueError:
+            raise ValueError(f"Cantidad de premios no válida en {spec!r}") from None
+        if count < 1:
+            raise ValueError(f"La categoría {parts[0]!r} debe tener al menos 1 premio.")
+        field, values = None, None
+        if len(parts) == 3 and parts[2]:
+            field, _, raw = parts[2].partition("=")
+            field = field.strip()
+            values = [v.strip() for v in raw.split("|") if v.strip()]
+        return cls(parts[0], count, field, values)
+
+    def __str__(self) -> str:
+        """Formato de texto de parse()."""
+        scope = f":{self.field}={'|'.join(self.values or ())}" if self.field else ""
+        return f"{self.name}:{self.count}{scope}"
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "count": self.count, "field": self.field,
+                "values": list(self.values) if self.values else None}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "PrizeTier":
+        return cls(d["name"], d["count"], d.get("field"), d.get("values"))
+
+    def __eq__(self, other):
+        return isinstance(other, PrizeTier) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"PrizeTier({self.name!r}, {self.count}, {self.field!r}, {self.values!r})"
+
+
+def parse_tiers(text: str) -> list:
+    """Categorías de un texto con una por línea (líneas vacías o con # se ignoran)."""
+    lines = (line.strip() for line in text.splitlines())
+    return [PrizeTier.parse(line) for line in lines if line and not line.startswith("#")]
+
+
+def format_tiers(tiers: list) -> str:
+    """Inverso de parse_tiers: una categoría por línea."""
+    return "\n".join(str(t) for t in tiers)
+
+
+def partition(data, field: str) -> dict:
+    """
+    {valor (texto sin espacios a los costados): posiciones ordenadas} de la
+    columna `field` de `data` (DataFrame o ParticipantStore), en una pasada
+    vectorizada (factorize + argsort). Los vacíos no entran en ningún grupo.
+    """
+    import pandas as pd
+    values = data[field] if hasattr(data, "iloc") else data.series(field)
+    codes, uniques = pd.factorize(values)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    groups = {}
+    for code, value in enumerate(uniques):
+        key = str(value).strip()
+        positions = order[bounds[code]:bounds[code + 1]]
+        # Valores que difieren solo en espacios caen en el mismo grupo
+        groups[key] = np.sort(np.concatenate((groups[key], positions))) if key in groups else positions
+    return groups
+
+
+class _TierPool:
+    """Vista de un pool de categoría con la interfaz de RemainingPool, en posiciones de fila."""
+    __slots__ = ("_draw", "_i")
+
+    def __init__(self, draw: "TierDraw", i: int):
+        self._draw, self._i = draw, i
+
+    def __len__(self) -> int:
+        return len(self._draw.pools[self._i])
+
+    def pick(self, rng) -> int:
+        return int(self._draw.positions[self._i][self._draw.pools[self._i].pick(rng)])
+
+    def take(self, k: int, rng) -> list:
+        drawn = self._draw.positions[self._i][self._draw.pools[self._i].take(k, rng)].tolist()
+        for pos in drawn:
+            self._draw.remove(pos)
+        return drawn
+
+    def remove(self, pos: int):
+        self._draw.remove(pos)
+
+    def add(self, pos: int):
+        self._draw.add(pos)
+
+
+class TierDraw:
+    """
+    Pools de un sorteo por categorías sobre `data` (DataFrame o ParticipantStore,
+    ya depurado). `weights` (por fila) y `eligible` (máscara) se aplican a
+    todas las categorías, como en make_pool. Se usa como pool: remove / add
+    reciben posiciones de fila y afectan a todas las categorías que la contienen.
+    """
+
+    def __init__(self, data, tiers: list, weights=None, eligible=None):
+        n = len(data)
+        self.tiers = list(tiers)
+        self.index = data.index if hasattr(data, "index") else None
+        partitions = {} # Una sola partición por columna, compartida entre categorías
+        self.positions = []
+        for tier in self.tiers:
+            if tier.field is None:
+                pos = np.arange(n, dtype=np.int64)
+            else:
+                if tier.field not in partitions:
+                    partitions[tier.field] = partition(data, tier.field)
+                groups = partitions[tier.field]
+                chosen = [groups[v] for v in (tier.values or groups) if v in groups]
+                pos = np.sort(np.concatenate(chosen)) if chosen else np.empty(0, dtype=np.int64)
+            if eligible is not None:
+                pos = pos[np.asarray(eligible, dtype=bool)[pos]]
+            self.positions.append(pos)
+        self.pools = [
+            make_pool(len(pos), None if weights is None else np.asarray(weights)[pos])
+            for pos in self.positions
+        ]
+        # Premios de cada categoría: [primero, último] en el orden dado
+        ends = np.cumsum([t.count for t in self.tiers]).tolist()
+        self.first_prize = [1] + [e + 1 for e in ends[:-1]]
+        self.num_winners = ends[-1] if ends else 0
+
+    def __bool__(self) -> bool:
+        return any(len(pool) for pool in self.pools)
+
+    def tier_of(self, prize: int) -> int:
+        """Índice de la categoría a la que pertenece el número de premio."""
+        for i in range(len(self.tiers) - 1, -1, -1):
+            if prize >= self.first_prize[i]:
+                return i
+        raise IndexError(prize)
+
+    def next_prize(self, awarded=(), descending: bool = False) -> int | None:
+        """
+        Próximo premio sin ganador (en orden ascendente o descendente) cuya
+        categoría aún tiene participantes; una categoría agotada deja sus premios
+        sin asignar. None si no queda ninguno sorteable.
+        """
+        awarded = set(awarded)
+        prizes = range(self.num_winners, 0, -1) if descending else range(1, self.num_winners + 1)
+        return next((p for p in prizes if p not in awarded and len(self.pools[self.tier_of(p)])), None)
+
+    def pool_for(self, prize: int) -> _TierPool:
+        """Pool (en posiciones de fila) de la categoría del premio, para sortearlo de a uno."""
+        return _TierPool(self, self.tier_of(prize))
+
+    def _locate(self, i: int, pos: int):
+        positions = self.positions[i]
+        j = int(np.searchsorted(positions, pos))
+        return j if j < len(positions) and positions[j] == pos else None
+
+    def remove(self, pos: int):
+        """Quita la posición de fila de todas las categorías (ganó en alguna)."""
+        for i, pool in enumerate(self.pools):
+            j = self._locate(i, pos)
+            if j is not None:
+                pool.remove(j)
+
+    def add(self, pos: int):
+        """Devuelve la posición de fila a todas sus categorías (ganador descartado)."""
+        for i, pool in enumerate(self.pools):
+            j = self._locate(i, pos)
+            if j is not None:
+                pool.add(j)
+
+    def winner(self, prize: int, pos: int) -> Winner:
+        i = self.tier_of(prize)
+        original = self.index[pos] if self.index is not None else None
+        return Winner(prize, pos, original, self.tiers[i].name)
+
+    def draw_all(self, rng, awarded=()) -> list:
+        """
+        Sortea todos los premios que faltan (los números en `awarded` ya tienen
+        ganador) y los quita de los pools, categoría por categoría en su orden.
+        Devuelve los Winner por premio.
+        """
+        awarded = set(awarded)
+        winners = []
+        with metrics.timed("draw_tiers"):
+            for i, (tier, first) in enumerate(zip(self.tiers, self.first_prize)):
+                missing = [p for p in range(first, first + tier.count) if p not in awarded]
+                # take quita a cada ganador de todas las categorías antes de pasar a la siguiente
+                drawn = _TierPool(self, i).take(len(missing), rng)
+                winners += [self.winner(prize, pos) for prize, pos in zip(missing, drawn)]
+        return winners
+
+
+# -------- Cuotas por grupo --------
+class GroupIndex:
+    """
+    Grupos de una columna (Ciudad, Area...), calculados una sola vez al cargar:
+    código de grupo por fila (-1 = vacío) y posiciones de fila de cada grupo.
+    """
+
+    def __init__(self, data, field: str):
+        self.field = field
+        groups = {name: positions for name, positions in partition(data, field).items() if name}
+        self.names = list(groups)
+        self.positions = list(groups.values())
+        self.codes = np.full(len(data), -1, dtype=np.int64)
+        for code, positions in enumerate(self.positions):
+            self.codes[positions] = code
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def quotas(self, quota) -> np.ndarray:
+        """Cuota por grupo: `quota` es la misma para todos (int) o {grupo: cantidad}."""
+        if isinstance(quota, dict):
+            return np.array([int(quota.get(name, 0)) for name in self.names], dtype=np.int64)
+        return np.full(len(self.names), int(quota), dtype=np.int64)
+
+    def counts(self, positions) -> np.ndarray:
+        """Cantidad de posiciones (p. ej. ganadores) de cada grupo."""
+        codes = self.codes[np.asarray(positions, dtype=np.int64)]
+        return np.bincount(codes[codes >= 0], minlength=len(self.names))
+
+
+def parse_quota(spec: str) -> tuple:
+    """'COLUMNA=K' (formato de la línea de comandos) -> (columna, K)."""
+    field, _, raw = spec.rpartition("=")
+    try:
+        k = int(raw)
+    except ValueError:
+        k = -1
+    if not field.strip() or k < 1:
+        raise ValueError(f"Cuota no válida (COLUMNA=MINIMO): {spec!r}")
+    return field.strip(), k
+
+
+def _pending(pool, index: GroupIndex, quota, taken) -> tuple:
+    """
+    (cuota pendiente por grupo, posiciones disponibles de esos grupos, pool
+    local sobre ellas). La cuota de un grupo se limita a los participantes que
+    le quedan: si se agota, lo que falta sale del pool completo.
+    """
+    need = np.maximum(index.quotas(quota) - index.counts(list(taken)), 0)
+    groups = np.flatnonzero(need)
+    if not len(groups):
+        return need, None, None
+    available, sub = pool.restrict(np.concatenate([index.positions[g] for g in groups]))
+    need = np.minimum(need, np.bincount(index.codes[available], minlength=len(index)))
+    return need, available, sub
+
+
+def pending_quota(pool, index: GroupIndex, quota, taken=()) -> int:
+    """Ganadores que las cuotas aún exigen, sin contar lo que los grupos ya no pueden aportar."""
+    return int(_pending(pool, index, quota, taken)[0].sum())
+
+
+def quota_pick(pool, index: GroupIndex, quota, taken, slots_left: int, rng) -> int:
+    """
+    Posición para el próximo premio (sin quitarla del pool) respetando las
+    cuotas, con `taken` = posiciones ya sorteadas y `slots_left` = premios que
+    faltan, este incluido. Mientras sobren premios sale del pool completo;
+    cuando solo alcanzan para las cuotas pendientes, de un grupo que las tenga.
+    """
+    with metrics.timed("draw", quota="1"):
+        # Sin contar disponibilidad (barato): si ni así faltan cupos, pool completo
+        if np.maximum(index.quotas(quota) - index.counts(list(taken)), 0).sum() < slots_left:
+            return pool.pick(rng)
+        need, available, sub = _pending(pool, index, quota, taken)
+        if need.sum() >= slots_left and available is not None and len(sub):
+            return int(available[sub.pick(rng)])
+        return pool.pick(rng)
+
+
+def quota_draw(pool, index: GroupIndex, quota, k: int, rng, taken=()) -> list:
+    """
+    Sortea `k` posiciones distintas del pool en una pasada y las quita: primero
+    la cuota pendiente de cada grupo (un take por grupo sobre su índice), luego
+    el resto del pool completo. Los premios se reparten al azar entre todas,
+    así cumplir una cuota no asigna los primeros premios.
+    """
+    with metrics.timed("draw_many", quota="1"):
+        need, _, _ = _pending(pool, index, quota, taken)
+        if need.sum() > k:
+            raise ValueError(f"Las cuotas suman {int(need.sum())} ganadores y solo quedan {k} premios.")
+        drawn = []
+        for g in np.flatnonzero(need):
+            available, sub = pool.restrict(index.positions[g])
+            chosen = available[sub.take(int(need[g]), rng)].tolist()
+            for pos in chosen:
+                pool.remove(pos)
+            drawn += chosen
+        drawn += pool.take(k - len(drawn), rng)
+        # Fisher-Yates con el flujo del sorteo: orden de premios reproducible
+        for i in range(len(drawn) - 1, 0, -1):
+            j = rng.randrange(i + 1)
+            drawn[i], drawn[j] = drawn[j], drawn[i]
+        return drawn
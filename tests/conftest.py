@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# Los módulos del sorteo están en la raíz del repositorio (sin paquete instalable)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def people():
+    """Doce participantes: 2 de Lima, 4 de Cusco y 6 de Piura (con Area y boletos)."""
+    cities = ["Lima"] * 2 + ["Cusco"] * 4 + ["Piura"] * 6
+    return pd.DataFrame({
+        "ID": [f"P{i:02d}" for i in range(12)],
+        "Nombre": [f"Persona {i}" for i in range(12)],
+        "Email": [f"p{i}@mail.com" for i in range(12)],
+        "Ciudad": cities,
+        "Area": ["Ventas", "TI"] * 6,
+        "Boletos": [1, 2, 0, 3, 1, 1, 5, 0, 1, 2, 1, 4],
+    })
+
+
+@pytest.fixture
+def open_raffle(people, tmp_path):
+    """Abre el sorteo compartido de `people` con su diario en tmp_path/sorteos (u otra carpeta)."""
+    from sorteo_registry import SharedRaffle
+
+    def open_(seed=None, journal_dir=None, data=None, **kw):
+        return SharedRaffle("r1", people if data is None else data, "digest1", seed,
+                            journal_dir=str(journal_dir or tmp_path / "sorteos"), **kw)
+    return open_
+
+
+@pytest.fixture
+def interrupt(tmp_path):
+    """Copia del diario tal como está ahora (como si la app se hubiera cerrado en ese punto)."""
+    import shutil
+
+    def copy_journal():
+        copy = tmp_path / "copia"
+        shutil.copytree(tmp_path / "sorteos", copy, dirs_exist_ok=True)
+        return copy
+    return copy_journal
@@ -0,0 +1,28 @@
+import pandas as pd
+
+import sorteo_cli
+from sorteo_logic import prepare_participants
+
+
+def test_duplicates_stay_unless_dedup_is_requested():
+    df = pd.DataFrame({"ID": ["1", "1 ", "2", "3"], "Nombre": list("abcd"), "Email": list("wxyz")})
+    kept, report = prepare_participants(df, "ID", exclude=[pd.Index(["3"])])
+    assert kept.index.tolist() == [0, 1, 2]
+    assert report["duplicates"] == 0 and report["excluded"] == 1
+    kept, report = prepare_participants(df, "ID", exclude=[pd.Index(["3"])], dedup=True)
+    assert kept.index.tolist() == [0, 2]
+    assert report == {"total": 4, "duplicates": 1, "excluded": 1, "previous_winners": 0, "eligible": 2}
+
+
+def test_cli_reads_key_and_export_columns_beyond_the_first_three(people, tmp_path, capsys):
+    path = tmp_path / "participantes.csv"
+    people.to_csv(path, index=False)
+    out = tmp_path / "ganadores.csv"
+    code = sorteo_cli.main([str(path), "-n", "3", "-s", "1", "--clave", "Ciudad", "--sin-duplicados",
+                            "--campo1", "Area", "--campo2", "Ciudad", "-o", str(out)])
+    assert code == 0, capsys.readouterr().err
+    assert "Duplicados: 9" in capsys.readouterr().out
+    # Una persona por ciudad: los 3 ganadores son de ciudades distintas
+    winners = pd.read_csv(out)
+    assert "Area" in winners.columns
+    assert sorted(winners["Ciudad"]) == ["Cusco", "Lima", "Piura"]
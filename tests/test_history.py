@@ -0,0 +1,50 @@
+import pytest
+
+from sorteo_history import WinnersHistory
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = WinnersHistory(str(tmp_path / "historial.sqlite"))
+    yield history
+    history.close()
+
+
+def draw_and_confirm(raffle, n):
+    for _ in range(n):
+        assert raffle.draw() is not None
+        raffle.confirm()
+
+
+def test_won_normalizes_keys_and_limits_to_last_events(history):
+    history.add("e1", [(" p01 ", 1)])
+    history.add("e2", [("P02", 1)])
+    history.add("e3", [("P03", 1), ("", 2)])
+    assert len(history) == 3
+    # Devuelve las claves normalizadas (ver normalize_keys)
+    assert sorted(history.won(["P01", "p02", "P03", "P04"])) == ["p01", "p02", "p03"]
+    assert sorted(history.won(["P01", "P02", "P03"], last_events=2)) == ["p02", "p03"]
+
+
+def test_won_excludes_the_event_and_its_runs(history):
+    history.add("abc", [("P01", 1)])
+    history.add("abc:1", [("P02", 1)])
+    history.add("abcd", [("P03", 1)])
+    assert history.won(["P01", "P02", "P03"], exclude_event="abc") == ["p03"]
+    history.clear("abcd")
+    assert history.won(["P03"]) == []
+
+
+def test_reset_keeps_history_of_finished_raffle(people, open_raffle, history):
+    raffle = open_raffle(seed=4, history=history, key_field="ID")
+    raffle.configure(2, None, 4)
+    raffle.draw_remaining()
+    raffle.reset()
+    assert len(history) == 2 and not raffle.winners
+    # Una vuelta sin terminar sí se borra al reiniciar
+    draw_and_confirm(raffle, 1)
+    assert len(history) == 3
+    raffle.reset()
+    assert len(history) == 2
+    # El propio sorteo (y sus vueltas) no cuenta como "ganó antes"
+    assert history.won(people["ID"], exclude_event="digest1") == []
@@ -0,0 +1,64 @@
+from sorteo_journal import CONFIG_KEYS, RaffleJournal, read_events, replay, winner_record
+from sorteo_logic import Winner
+
+
+def test_journal_round_trip_ignores_truncated_last_line(tmp_path):
+    path = tmp_path / "sorteos" / "abc.jsonl"
+    journal = RaffleJournal(str(path), fsync=False)
+    journal.append("start", n=3)
+    journal.append("draw", prize=1, position=2, original_index=7)
+    journal.close()
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write('{"event": "confirm", "pri')
+    assert [e["event"] for e in read_events(str(path))] == ["start", "draw"]
+    assert read_events(str(tmp_path / "no_existe.jsonl")) == []
+
+
+def test_winner_record_from_winner_and_event():
+    assert winner_record(Winner(1, 4, "x")) == {"prize": 1, "position": 4, "original_index": "x"}
+    assert winner_record(Winner(2, 5, None, "Mayor"))["tier"] == "Mayor"
+    # Diarios anteriores guardaban la posición como "index"
+    assert winner_record({"prize": 3, "index": 6})["position"] == 6
+
+
+def test_replay_rebuilds_winners_candidate_and_config():
+    rng = {"seed": 9, "draws": 0}
+    events = [
+        {"event": "start", "n": 10, "rng": rng, "num_winners": 3, "seed": 9},
+        {"event": "draw", "prize": 1, "position": 4, "rng": {"seed": 9, "draws": 1}},
+        {"event": "confirm", "prize": 1, "position": 4},
+        {"event": "draw", "prize": 2, "position": 8},
+        {"event": "redraw"},
+        {"event": "draw", "prize": 2, "position": 1, "quota": {"field": "Ciudad", "min": 1}},
+    ]
+    state = replay(events)
+    assert state["start"]["n"] == 10
+    assert [w["position"] for w in state["winners"]] == [4]
+    assert state["candidate"]["position"] == 1
+    assert state["rng"] == {"seed": 9, "draws": 1}
+    assert state["num_winners"] == 3 and state["seed"] == 9
+    assert state["quota"] == {"field": "Ciudad", "min": 1}
+    assert set(CONFIG_KEYS) <= set(state)
+
+
+def test_replay_reset_and_draw_many():
+    events = [
+        {"event": "start", "n": 5},
+        {"event": "draw_many", "winners": [{"prize": 1, "position": 0}, {"prize": 2, "position": 3, "tier": "A"}]},
+        {"event": "reset", "history_event": "abc:1"},
+        {"event": "draw_many", "winners": [{"prize": 1, "position": 2}]},
+    ]
+    state = replay(events)
+    assert state["winners"] == [{"prize": 1, "position": 2, "original_index": None}]
+    assert state["history_event"] == "abc:1"
+    assert state["candidate"] is None
+
+
+def test_replay_marks_finished_until_the_next_start():
+    events = [
+        {"event": "start", "n": 10, "num_winners": 5},
+        {"event": "confirm", "prize": 5, "position": 2},
+        {"event": "finish"},
+    ]
+    assert replay(events)["finished"]
+    assert not replay(events + [{"event": "start", "n": 10}])["finished"]
@@ -0,0 +1,36 @@
+import random
+
+import numpy as np
+import pytest
+
+from sorteo_logic import RemainingPool
+
+
+def test_remaining_pool_take_is_distinct_and_skips_ineligible():
+    eligible = np.array([True, False, True, True, False, True])
+    pool = RemainingPool(6, eligible)
+    assert len(pool) == 4 and 1 not in pool
+    drawn = pool.take(10, random.Random(1))
+    assert sorted(drawn) == [0, 2, 3, 5]
+    assert len(pool) == 0
+    with pytest.raises(IndexError):
+        pool.pick(random.Random(1))
+
+
+def test_remaining_pool_remove_and_add():
+    pool = RemainingPool(5)
+    pool.remove(3)
+    pool.remove(3)
+    assert len(pool) == 4 and 3 not in pool
+    pool.add(3)
+    assert len(pool) == 5 and 3 in pool
+    with pytest.raises(IndexError):
+        pool.add(5)
+
+
+def test_remaining_pool_restrict_keeps_only_available():
+    pool = RemainingPool(6)
+    pool.remove(2)
+    available, sub = pool.restrict([1, 2, 4])
+    assert available.tolist() == [1, 4]
+    assert len(sub) == 2
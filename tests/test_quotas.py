@@ -0,0 +1,107 @@
+import pytest
+
+from sorteo_logic import RaffleRng, make_pool
+from sorteo_tiers import GroupIndex, parse_quota, pending_quota, quota_pick, quota_draw
+
+LIMA = range(0, 2)
+
+
+def test_parse_quota():
+    assert parse_quota("Ciudad=2") == ("Ciudad", 2)
+    for spec in ("Ciudad", "=2", "Ciudad=0", "Ciudad=x"):
+        with pytest.raises(ValueError):
+            parse_quota(spec)
+
+
+def test_group_index_counts_and_quotas(people):
+    index = GroupIndex(people, "Ciudad")
+    assert index.names == ["Lima", "Cusco", "Piura"]
+    assert index.counts([0, 2, 3, 11]).tolist() == [1, 2, 1]
+    assert index.quotas(2).tolist() == [2, 2, 2]
+    assert index.quotas({"Lima": 1}).tolist() == [1, 0, 0]
+
+
+def test_pending_quota_is_capped_by_what_groups_can_give(people):
+    index = GroupIndex(people, "Ciudad")
+    pool = make_pool(len(people))
+    assert pending_quota(pool, index, 3) == 2 + 3 + 3
+    pool.remove(0)
+    # Lima solo puede aportar una persona más
+    assert pending_quota(pool, index, 3, taken=[2]) == 1 + 2 + 3
+
+
+def test_quota_draw_meets_quotas_and_is_reproducible(people):
+    index = GroupIndex(people, "Ciudad")
+
+    def run(seed):
+        pool = make_pool(len(people))
+        drawn = quota_draw(pool, index, 1, 3, RaffleRng(seed))
+        return pool, drawn
+
+    for seed in range(20):
+        pool, drawn = run(seed)
+        assert index.counts(drawn).tolist() == [1, 1, 1]
+        assert len(pool) == len(people) - 3 and not any(pos in pool for pos in drawn)
+    assert run(4)[1] == run(4)[1]
+
+
+def test_quota_draw_counts_winners_already_taken(people):
+    index = GroupIndex(people, "Ciudad")
+    pool = make_pool(len(people))
+    pool.remove(0)
+    drawn = quota_draw(pool, index, 1, 2, RaffleRng(8), taken=[0])
+    assert index.counts(drawn + [0]).min() == 1
+
+
+def test_quota_draw_rejects_more_quota_than_prizes(people):
+    index = GroupIndex(people, "Ciudad")
+    with pytest.raises(ValueError):
+        quota_draw(make_pool(len(people)), index, 2, 5, RaffleRng(1))
+
+
+def test_quota_pick_uses_pending_groups_only_when_prizes_are_tight(people):
+    index = GroupIndex(people, "Ciudad")
+    pool = make_pool(len(people))
+    taken = [2, 6]  # Cusco y Piura ya tienen ganador; falta Lima
+    for pos in taken:
+        pool.remove(pos)
+    for seed in range(20):
+        assert quota_pick(pool, index, 1, taken, 1, RaffleRng(seed)) in LIMA
+    picks = {quota_pick(pool, index, 1, taken, 3, RaffleRng(seed)) for seed in range(50)}
+    assert picks - set(LIMA)
+
+
+def test_quota_is_frozen_once_there_are_winners(people, open_raffle):
+    quota = {"field": "Ciudad", "min": 1}
+    raffle = open_raffle(seed=2)
+    raffle.configure(4, None, 2, quota=quota)
+    assert raffle.pending_quota(quota) == 3
+    winners = raffle.draw_remaining()
+    cities = {people["Ciudad"].iloc[w.position] for w in winners}
+    assert cities == {"Lima", "Cusco", "Piura"}
+    raffle.configure(4, None, 2, quota=None)
+    assert raffle.quota == quota
+
+
+def test_draw_remaining_with_impossible_quota_raises(open_raffle):
+    raffle = open_raffle(seed=2)
+    raffle.configure(2, None, 2, quota={"field": "Ciudad", "min": 1})
+    with pytest.raises(ValueError):
+        raffle.draw_remaining()
+    assert not raffle.winners
+
+
+def test_pending_quota_is_computed_once_per_pool_state(open_raffle, monkeypatch):
+    import sorteo_registry
+    calls = []
+    monkeypatch.setattr(sorteo_registry, "pending_quota", lambda *a: calls.append(a) or pending_quota(*a))
+    quota = {"field": "Ciudad", "min": 1}
+    raffle = open_raffle(seed=2)
+    raffle.configure(4, None, 2, quota=quota)
+    assert raffle.pending_quota(quota) == raffle.pending_quota(quota) == 3
+    assert len(calls) == 1
+    # Un ganador confirmado cambia el pool: se vuelve a calcular
+    raffle.draw()
+    raffle.confirm()
+    assert raffle.pending_quota(quota) == 2
+    assert len(calls) == 2
@@ -0,0 +1,118 @@
+import pytest
+
+from sorteo_registry import RaffleRegistry
+
+
+def draw_and_confirm(raffle, n):
+    for _ in range(n):
+        assert raffle.draw() is not None
+        raffle.confirm()
+
+
+def positions(winners):
+    return [(w.prize, w.position) for w in winners]
+
+
+def test_draw_confirm_redraw(open_raffle):
+    raffle = open_raffle(seed=5)
+    raffle.configure(3, None, 5)
+    cand = raffle.draw()
+    assert raffle.draw() is cand  # Un solo candidato pendiente
+    raffle.redraw()
+    assert raffle.candidate is None and not raffle.winners
+    draw_and_confirm(raffle, 3)
+    assert [w.prize for w in raffle.winners] == [1, 2, 3]
+    assert len({w.position for w in raffle.winners}) == 3
+    assert raffle.draw() is None
+
+
+@pytest.mark.parametrize("seed", [None, 17])
+def test_resume_continues_the_same_stream(open_raffle, interrupt, seed):
+    raffle = open_raffle(seed=seed)
+    raffle.configure(5, None, seed)
+    draw_and_confirm(raffle, 2)
+    cand = raffle.draw()
+    copy = interrupt()
+
+    resumed = open_raffle(seed=seed, journal_dir=copy)
+    assert resumed.resumed
+    assert positions(resumed.winners) == positions(raffle.winners)
+    assert (resumed.candidate.prize, resumed.candidate.position) == (cand.prize, cand.position)
+    assert resumed.rng.to_dict() == raffle.rng.to_dict()
+    # La semilla del anfitrión no es la entropía del flujo: sin semilla sigue siendo None
+    assert resumed.seed == seed
+
+    raffle.confirm()
+    resumed.confirm()
+    assert positions(resumed.draw_remaining()) == positions(raffle.draw_remaining())
+
+
+def test_resume_without_seed_keeps_stream_when_host_reconfigures(open_raffle):
+    raffle = open_raffle()
+    raffle.configure(4, None, None)
+    draw_and_confirm(raffle, 2)
+    raffle.close()
+
+    resumed = open_raffle()
+    state = resumed.rng.to_dict()
+    # La app vuelve a aplicar la configuración (sin semilla) en cada ejecución
+    resumed.configure(4, None, None)
+    assert resumed.rng.to_dict() == state
+
+
+def test_resume_ignores_journal_of_other_data(people, open_raffle):
+    raffle = open_raffle(seed=1)
+    draw_and_confirm(raffle, 1)
+    raffle.close()
+    other = open_raffle(1, data=people.iloc[:6])
+    assert not other.resumed and not other.winners
+
+
+def test_changes_since_returns_only_new_events(open_raffle):
+    raffle = open_raffle(seed=6)
+    version, _ = raffle.changes_since(0)
+    raffle.draw()
+    raffle.confirm()
+    new_version, changes = raffle.changes_since(version)
+    assert [event for _, event, _ in changes] == ["draw", "confirm"]
+    assert raffle.changes_since(new_version) == (new_version, [])
+
+
+def test_registry_shares_raffles_and_evicts_least_used(people, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    registry = RaffleRegistry(max_raffles=2)
+    a = registry.open("a" * 32, people, 1)
+    assert registry.open("a" * 32, people, 1) is a
+    registry.open("b" * 32, people, 1)
+    registry.get(a.id)
+    registry.open("c" * 32, people, 1)
+    assert registry.get(a.id) is a
+    assert registry.get("b" * 12) is None
+
+
+def test_changes_are_bounded_and_light(open_raffle, monkeypatch):
+    import sorteo_registry
+    monkeypatch.setattr(sorteo_registry, "MAX_CHANGES", 4)
+    raffle = open_raffle(seed=6)
+    raffle.configure(8, None, 6)
+    draw_and_confirm(raffle, 3)
+    raffle.draw_remaining()
+    version, changes = raffle.changes_since(0)
+    # Solo los últimos MAX_CHANGES eventos; draw_many sin la lista de ganadores
+    assert [v for v, _, _ in changes] == list(range(version - 3, version + 1))
+    assert changes[-1][1:] == ("draw_many", {})
+
+
+def test_weight_and_seed_are_frozen_once_the_raffle_started(open_raffle):
+    raffle = open_raffle(seed=3)
+    raffle.configure(4, "Boletos", 4)
+    assert raffle.weight_field == "Boletos" and raffle.rng.to_dict() == {"seed": 4, "draws": 0}
+    raffle.draw()
+    state = raffle.rng.to_dict()
+    # Cada ejecución del anfitrión vuelve a aplicar la configuración: con candidato ya no cambia
+    raffle.configure(5, None, 99)
+    assert raffle.weight_field == "Boletos" and raffle.seed == 4 and raffle.rng.to_dict() == state
+    assert raffle.num_winners == 5
+    raffle.confirm()
+    raffle.configure(5, None, None)
+    assert raffle.weight_field == "Boletos" and raffle.seed == 4
@@ -0,0 +1,18 @@
+from sorteo_logic import RaffleRng
+
+
+def test_raffle_rng_resumes_where_it_stopped():
+    rng = RaffleRng(42)
+    first = [rng.randrange(1000) for _ in range(5)]
+    resumed = RaffleRng.from_dict({"seed": 42, "draws": 2})
+    assert [resumed.randrange(1000) for _ in range(3)] == first[2:]
+    assert resumed.to_dict() == rng.to_dict() == {"seed": 42, "draws": 5}
+
+
+def test_raffle_rng_without_seed_records_its_entropy():
+    rng = RaffleRng()
+    values = [rng.random() for _ in range(3)]
+    assert all(0.0 <= v < 1.0 for v in values)
+    replay = RaffleRng(rng.seed)
+    assert [replay.random() for _ in range(3)] == values
+
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from sorteo_logic import RaffleRng
+from sorteo_tiers import PrizeTier, TierDraw, parse_tiers, format_tiers
+
+LIMA, CUSCO = range(0, 2), range(2, 6)
+
+
+def draw_and_confirm(raffle, n):
+    for _ in range(n):
+        assert raffle.draw() is not None
+        raffle.confirm()
+
+
+def positions(winners):
+    return [(w.prize, w.position) for w in winners]
+
+
+def test_parse_and_format_tiers_round_trip():
+    text = "# comentario\nMayor:1\n\nMedio:3:Ciudad=Lima|Cusco"
+    tiers = parse_tiers(text)
+    assert tiers == [PrizeTier("Mayor", 1), PrizeTier("Medio", 3, "Ciudad", ["Lima", "Cusco"])]
+    assert parse_tiers(format_tiers(tiers)) == tiers
+
+
+@pytest.mark.parametrize("spec", ["Mayor", ":2", "Mayor:dos", "Mayor:0"])
+def test_parse_tier_rejects_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        PrizeTier.parse(spec)
+
+
+def test_tier_draw_numbers_prizes_in_tier_order(people):
+    draw = TierDraw(people, parse_tiers("Lima:3:Ciudad=Lima\nTodos:2"))
+    assert draw.num_winners == 5
+    assert draw.first_prize == [1, 4]
+    assert [draw.tier_of(p) for p in range(1, 6)] == [0, 0, 0, 1, 1]
+    assert draw.positions[0].tolist() == list(LIMA)
+
+
+def test_next_prize_skips_exhausted_tier(people):
+    draw = TierDraw(people, parse_tiers("Lima:3:Ciudad=Lima\nCusco:2:Ciudad=Cusco"))
+    assert draw.next_prize() == 1
+    for pos in LIMA:
+        draw.remove(pos)
+    # Lima se quedó sin participantes con el premio #3 sin ganador: se salta
+    assert draw.next_prize(awarded={1, 2}) == 4
+    assert draw.next_prize(awarded={1, 2}, descending=True) == 5
+    for pos in CUSCO:
+        draw.remove(pos)
+    assert draw.next_prize(awarded={1, 2}) is None
+    assert not draw
+
+
+def test_remove_and_add_affect_every_tier(people):
+    draw = TierDraw(people, parse_tiers("Lima:1:Ciudad=Lima\nTodos:2"))
+    draw.remove(0)
+    assert len(draw.pools[0]) == 1 and len(draw.pools[1]) == 11
+    draw.add(0)
+    assert len(draw.pools[0]) == 2 and len(draw.pools[1]) == 12
+
+
+def test_draw_all_respects_tiers_and_is_reproducible(people):
+    spec = "Lima:2:Ciudad=Lima\nCusco:2:Ciudad=Cusco\nTodos:3"
+
+    def run():
+        draw = TierDraw(people, parse_tiers(spec))
+        return draw, draw.draw_all(RaffleRng(11))
+
+    draw, winners = run()
+    assert [w.prize for w in winners] == list(range(1, 8))
+    positions = [w.position for w in winners]
+    assert len(set(positions)) == 7
+    assert sorted(positions[:2]) == list(LIMA) and set(positions[2:4]) <= set(CUSCO)
+    assert [w.tier for w in winners] == ["Lima"] * 2 + ["Cusco"] * 2 + ["Todos"] * 3
+    # Quien gana sale de todas las categorías
+    assert [len(pool) for pool in draw.pools] == [0, 2, 12 - 7]
+    assert [(w.prize, w.position) for w in run()[1]] == [(w.prize, w.position) for w in winners]
+
+
+def test_draw_all_skips_awarded_prizes(people):
+    draw = TierDraw(people, parse_tiers("Lima:1:Ciudad=Lima\nTodos:2"))
+    draw.remove(0)
+    winners = draw.draw_all(RaffleRng(5), awarded={1})
+    assert [w.prize for w in winners] == [2, 3]
+    assert 0 not in [w.position for w in winners]
+
+
+def test_tier_draw_applies_weights_and_eligibility(people):
+    eligible = np.ones(len(people), dtype=bool)
+    eligible[6] = False
+    draw = TierDraw(people, parse_tiers("Piura:6:Ciudad=Piura"), weights=people["Boletos"].to_numpy(), eligible=eligible)
+    assert draw.positions[0].tolist() == [7, 8, 9, 10, 11]
+    # Piura 7 tiene 0 boletos: solo salen 8..11 aunque haya 6 premios
+    winners = draw.draw_all(RaffleRng(3))
+    assert sorted(w.position for w in winners) == [8, 9, 10, 11]
+
+
+def test_exhausted_tier_leaves_its_prizes_unassigned(open_raffle):
+    raffle = open_raffle(seed=3)
+    raffle.configure(0, None, 3, tiers=parse_tiers("Lima:3:Ciudad=Lima\nCusco:2:Ciudad=Cusco"))
+    assert raffle.num_winners == 5
+    drawn = []
+    while (cand := raffle.draw()) is not None:
+        drawn.append((cand.prize, cand.tier))
+        raffle.confirm()
+    # Lima solo tiene 2 participantes: el premio #3 se salta, sin bloquear a Cusco
+    assert drawn == [(1, "Lima"), (2, "Lima"), (4, "Cusco"), (5, "Cusco")]
+    assert raffle.next_prize() is None
+
+
+def test_tiers_resume_from_journal(open_raffle, interrupt):
+    tiers = parse_tiers("Lima:1:Ciudad=Lima\nTodos:3")
+    raffle = open_raffle(seed=8)
+    raffle.configure(0, None, 8, tiers=tiers)
+    draw_and_confirm(raffle, 1)
+    resumed = open_raffle(seed=8, journal_dir=interrupt())
+    assert resumed.tiers == tiers and resumed.num_winners == 4
+    assert resumed.next_prize() == 2
+    assert positions(resumed.draw_remaining()) == positions(raffle.draw_remaining())
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from sorteo_logic import RaffleRng, RemainingPool, WeightedPool, make_pool
+
+
+def test_weighted_pool_never_draws_zero_or_invalid_weights():
+    pool = WeightedPool([0, 2, float("nan"), -1, 3, float("inf")])
+    assert len(pool) == 2
+    assert pool.total() == pytest.approx(5.0)
+    assert sorted(pool.take(10, RaffleRng(7))) == [1, 4]
+    assert len(pool) == 0 and pool.total() == pytest.approx(0.0)
+
+
+def test_weighted_pool_remove_add_updates_total():
+    pool = WeightedPool([1.0, 2.0, 3.0, 4.0])
+    pool.remove(2)
+    assert pool.total() == pytest.approx(7.0) and 2 not in pool
+    pool.add(2)
+    assert pool.total() == pytest.approx(10.0) and len(pool) == 4
+    # pick no quita: la posición sigue disponible
+    pos = pool.pick(RaffleRng(3))
+    assert pos in pool and len(pool) == 4
+
+
+def test_weighted_pool_is_proportional_to_weights():
+    pool = WeightedPool([1.0, 3.0])
+    rng = RaffleRng(2024)
+    hits = np.bincount([pool.pick(rng) for _ in range(20_000)], minlength=2)
+    assert hits[1] / hits.sum() == pytest.approx(0.75, abs=0.02)
+
+
+def test_weighted_pool_restrict_keeps_weights_of_available():
+    pool = WeightedPool([1.0, 0.0, 2.0, 5.0])
+    pool.remove(3)
+    available, sub = pool.restrict([1, 2, 3])
+    assert available.tolist() == [2]
+    assert len(sub) == 1 and sub.total() == pytest.approx(2.0)
+
+
+def test_make_pool_applies_eligibility_to_weights():
+    pool = make_pool(4, weights=np.array([1.0, 1.0, 1.0, 1.0]), eligible=np.array([True, False, True, False]))
+    assert isinstance(pool, WeightedPool)
+    assert sorted(pool.take(4, RaffleRng(5))) == [0, 2]
+    assert isinstance(make_pool(4), RemainingPool)